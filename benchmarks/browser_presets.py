@@ -0,0 +1,181 @@
+"""
+Launch time and memory of the browser for each `browser_preset`.
+
+Usage: python benchmarks/browser_presets.py [--presets default,fast_start,low_memory]
+                                            [--runs 3] [--settle 5] [--browser-path PATH]
+
+For each run a local page is served, the browser is started with the flags
+FlaskUI would use and a fresh profile, then:
+
+- first_request_seconds: browser start to the page request;
+- page_loaded_seconds: browser start to the page script calling back;
+- peak_rss_mb / settled_rss_mb: RSS of the browser process tree, highest
+  and at the end of the settle time (shared pages are counted once per
+  process, compare presets with each other rather than with task managers);
+- processes: number of processes in the browser tree when settled.
+
+Needs psutil and a Chromium based browser (found like FlaskUI does or
+given with --browser-path). Prints a JSON report with the median of the runs.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import flaskwebgui  # noqa: E402
+
+PAGE = b"""<!doctype html>
+<html><body><h1>flaskwebgui</h1>
+<script>fetch("/loaded")</script>
+</body></html>"""
+
+
+class Events:
+    def __init__(self):
+        self.first_request = threading.Event()
+        self.loaded = threading.Event()
+
+
+def create_server(events: Events):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/loaded":
+                events.loaded.set()
+                body = b""
+            else:
+                events.first_request.set()
+                body = PAGE
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def tree_memory(process):
+    import psutil
+
+    try:
+        tree = [process] + process.children(recursive=True)
+    except psutil.Error:
+        return 0, 0
+    rss = 0
+    for proc in tree:
+        try:
+            rss += proc.memory_info().rss
+        except psutil.Error:
+            continue
+    return rss, len(tree)
+
+
+def measure(preset: str, browser_path: str, settle: float):
+    import psutil
+
+    events = Events()
+    server = create_server(events)
+    port = server.server_address[1]
+
+    ui = flaskwebgui.FlaskUI(
+        server=lambda **kwargs: None,
+        server_kwargs={"port": port},
+        browser_path=browser_path,
+        browser_preset=preset,
+        cleanup_stale_profiles=False,
+    )
+
+    start = time.perf_counter()
+    browser = subprocess.Popen(
+        ui.browser_command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    process = psutil.Process(browser.pid)
+
+    first_request = page_loaded = None
+    peak_rss = settled_rss = processes = 0
+    deadline = start + settle
+    while time.perf_counter() < deadline:
+        if first_request is None and events.first_request.is_set():
+            first_request = time.perf_counter() - start
+        if page_loaded is None and events.loaded.is_set():
+            page_loaded = time.perf_counter() - start
+        settled_rss, processes = tree_memory(process)
+        peak_rss = max(peak_rss, settled_rss)
+        time.sleep(0.05)
+
+    for proc in [process] + process.children(recursive=True):
+        try:
+            proc.kill()
+        except psutil.Error:
+            pass
+    browser.wait()
+    server.shutdown()
+    server.server_close()
+    flaskwebgui.release_lock(ui.profile_lock)
+    shutil.rmtree(ui.profile_dir, ignore_errors=True)
+
+    return {
+        "first_request_seconds": first_request,
+        "page_loaded_seconds": page_loaded,
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+        "settled_rss_mb": round(settled_rss / 1024 / 1024, 1),
+        "processes": processes,
+    }
+
+
+def median(runs: list, metric: str):
+    values = [run[metric] for run in runs if run[metric] is not None]
+    return round(statistics.median(values), 4) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--presets", default=",".join(flaskwebgui.browser_flag_presets))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--settle", type=float, default=5.0)
+    parser.add_argument("--browser-path", default=None)
+    args = parser.parse_args()
+
+    browser_path = args.browser_path or flaskwebgui.discover_browser().path
+    if browser_path is None:
+        sys.exit("No browser found, use --browser-path")
+
+    results = {}
+    for preset in args.presets.split(","):
+        runs = [measure(preset, browser_path, args.settle) for _ in range(args.runs)]
+        results[preset] = {
+            metric: median(runs, metric)
+            for metric in [
+                "first_request_seconds",
+                "page_loaded_seconds",
+                "peak_rss_mb",
+                "settled_rss_mb",
+                "processes",
+            ]
+        }
+
+    report = {
+        "browser": browser_path,
+        "version": flaskwebgui.get_browser_version(browser_path),
+        "settle": args.settle,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Measure the cost of `import flaskwebgui` and check it has no side effects.
+
+Usage: python benchmarks/import_time.py [--runs 10] [--max-ms 100]
+
+Runs `python -X importtime -c "import flaskwebgui"` in fresh interpreters and
+prints a JSON report. Exits with an error if a heavy module gets imported,
+logging gets configured or the best import time is over --max-ms.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+LAZY_MODULES = [
+    "psutil",
+    "multiprocessing",
+    "subprocess",
+    "socketserver",
+    "tempfile",
+    "shutil",
+    "urllib.request",
+    "uuid",
+]
+
+CHECK_SIDE_EFFECTS = f"""
+import sys, json, logging
+import flaskwebgui
+print(json.dumps({{
+    "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules],
+    "root_handlers": len(logging.getLogger().handlers),
+}}))
+"""
+
+
+def import_time_us(env: dict):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import flaskwebgui"],
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stderr
+
+    for line in output.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "flaskwebgui":
+            return int(parts[0].split(":")[-1]), int(parts[1])
+
+    raise RuntimeError(f"flaskwebgui not found in -X importtime output:\n{output}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": SRC}
+    timings = [import_time_us(env) for _ in range(args.runs)]
+
+    side_effects = json.loads(
+        subprocess.run(
+            [sys.executable, "-c", CHECK_SIDE_EFFECTS],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        ).stdout
+    )
+
+    report = {
+        "runs": args.runs,
+        "self_ms_min": min(self_us for self_us, _ in timings) / 1000,
+        "cumulative_ms_min": min(total_us for _, total_us in timings) / 1000,
+        "cumulative_ms_avg": sum(total_us for _, total_us in timings)
+        / len(timings)
+        / 1000,
+        **side_effects,
+    }
+    print(json.dumps(report, indent=2))
+
+    errors = []
+    if side_effects["loaded"]:
+        errors.append(f"modules imported eagerly: {side_effects['loaded']}")
+    if side_effects["root_handlers"]:
+        errors.append("logging was configured at import time")
+    if report["cumulative_ms_min"] > args.max_ms:
+        errors.append(f"import took {report['cumulative_ms_min']}ms > {args.max_ms}ms")
+
+    if errors:
+        sys.exit("\n".join(errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Launch, first request, shutdown and memory footprint of FlaskUI.run per server.
+
+Usage: python benchmarks/launch.py [--servers flask,fastapi,django,flask_socketio,custom]
+                                   [--runs 5] [--browser-lifetime 1] [--output results.json]
+
+Each run starts a fresh interpreter that calls `FlaskUI.run` with a stub browser
+(a small python script which requests the app url, waits and exits) so it works
+headless on CI. Reported per server (median and max of the runs, in seconds):
+
+- time_to_listening: from FlaskUI creation to the server accepting connections;
+- time_to_first_request: from FlaskUI creation to the first app request
+  (null for the custom server, its app is not wrapped by flaskwebgui);
+- shutdown_latency: from the browser exit to the app process exit;
+- peak_rss_mb: peak RSS of the app process tree (server + stub browser).
+
+Servers whose packages are not installed are reported as skipped. Needs psutil.
+Compare two versions with the JSON written by `--output`.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+STUB_BROWSER = """#!{python}
+import sys, time, urllib.request
+
+url = [arg[6:] for arg in sys.argv if arg.startswith("--app=")][0]
+try:
+    urllib.request.urlopen(url, timeout=30).read()
+finally:
+    time.sleep({lifetime})
+"""
+
+SERVERS = ["flask", "fastapi", "django", "flask_socketio", "custom"]
+
+
+def create_app(server: str):
+    if server in ("flask", "flask_socketio"):
+        from flask import Flask
+
+        app = Flask(__name__)
+        app.add_url_rule("/", "index", lambda: "ok")
+        return app
+
+    if server == "fastapi":
+        from fastapi import FastAPI
+
+        app = FastAPI()
+        app.get("/")(lambda: "ok")
+        return app
+
+    if server == "django":
+        import django
+        from django.conf import settings
+        from django.http import HttpResponse
+        from django.urls import path
+
+        settings.configure(
+            DEBUG=False,
+            ALLOWED_HOSTS=["*"],
+            ROOT_URLCONF=__name__,
+            SECRET_KEY="benchmark",
+        )
+        globals()["urlpatterns"] = [path("", lambda request: HttpResponse("ok"))]
+        django.setup()
+
+        from django.core.wsgi import get_wsgi_application
+
+        return get_wsgi_application()
+
+    raise ValueError(f"Unknown server {server}")
+
+
+def start_custom_server(**server_kwargs):
+    from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+    def app(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"ok"]
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    make_server(
+        "127.0.0.1", server_kwargs["port"], app, handler_class=QuietHandler
+    ).serve_forever()
+
+
+def child(server: str, browser_path: str, timeline_path: str):
+    import flaskwebgui
+
+    if server == "custom":
+        ui = flaskwebgui.FlaskUI(
+            server=start_custom_server,
+            server_kwargs={"port": flaskwebgui.get_free_port()},
+            browser_path=browser_path,
+            timeline_path=timeline_path,
+        )
+    else:
+        app = create_app(server)
+        socketio = None
+        if server == "flask_socketio":
+            from flask_socketio import SocketIO
+
+            socketio = SocketIO(app)
+        ui = flaskwebgui.FlaskUI(
+            app=app,
+            socketio=socketio,
+            server=server,
+            browser_path=browser_path,
+            timeline_path=timeline_path,
+        )
+    ui.run()
+
+
+def measure(server: str, browser_path: str, workdir: str):
+    import psutil
+
+    timeline_path = os.path.join(workdir, f"{server}-timeline.json")
+    if os.path.exists(timeline_path):
+        os.remove(timeline_path)
+
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--child", server, "--stub", browser_path],
+        env={**os.environ, "FLASKWEBGUI_TIMELINE": timeline_path},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    parent = psutil.Process(process.pid)
+
+    peak_rss = 0
+    while process.poll() is None:
+        try:
+            tree = [parent] + parent.children(recursive=True)
+        except psutil.Error:
+            break
+        rss = 0
+        for proc in tree:
+            try:
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        peak_rss = max(peak_rss, rss)
+        time.sleep(0.01)
+    stderr = process.communicate()[1].decode(errors="replace")
+    exited_at = time.time()
+
+    if "ModuleNotFoundError" in stderr:
+        return {"skipped": stderr.strip().splitlines()[-1]}
+
+    try:
+        with open(timeline_path) as f:
+            timeline = json.load(f)
+    except OSError:
+        return {"error": stderr.strip().splitlines()[-1] if stderr else "no timeline"}
+
+    events = {event["name"]: event["start"] for event in timeline["events"]}
+    started_at = timeline["started_at"]
+    browser_exit = events.get("browser_exit")
+
+    return {
+        "time_to_listening": events.get("server_listening"),
+        "time_to_first_request": events.get("first_request"),
+        "shutdown_latency": (
+            round(exited_at - started_at - browser_exit, 6)
+            if browser_exit is not None
+            else None
+        ),
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+        "exit_code": process.returncode,
+    }
+
+
+def summarize(runs: list):
+    if any("skipped" in run for run in runs):
+        return runs[0]
+
+    summary = {"runs": len(runs), "errors": [run for run in runs if "error" in run]}
+    runs = [run for run in runs if "error" not in run]
+    for metric in [
+        "time_to_listening",
+        "time_to_first_request",
+        "shutdown_latency",
+        "peak_rss_mb",
+    ]:
+        values = [run[metric] for run in runs if run[metric] is not None]
+        summary[metric] = (
+            {"median": round(statistics.median(values), 4), "max": max(values)}
+            if values
+            else None
+        )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--servers", default=",".join(SERVERS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--browser-lifetime", type=float, default=1.0)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--stub", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child, args.stub, os.environ["FLASKWEBGUI_TIMELINE"])
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        browser_path = os.path.join(workdir, "stub-browser")
+        with open(browser_path, "w") as f:
+            f.write(
+                STUB_BROWSER.format(
+                    python=sys.executable, lifetime=args.browser_lifetime
+                )
+            )
+        os.chmod(browser_path, 0o755)
+
+        results = {}
+        for server in args.servers.split(","):
+            runs = []
+            for _ in range(args.runs):
+                runs.append(measure(server, browser_path, workdir))
+                if "skipped" in runs[-1]:
+                    break
+            results[server] = summarize(runs)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "browser_lifetime": args.browser_lifetime,
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
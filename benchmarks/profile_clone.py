@@ -0,0 +1,116 @@
+"""
+Compare browser startup with an empty profile against a profile cloned from a seeded template.
+
+Usage: python benchmarks/profile_clone.py [--browser PATH] [--runs 5] [--headless]
+
+Prints a JSON report with the clone time and the time from spawning the browser
+until it requested the page.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import flaskwebgui  # noqa: E402
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    requested = threading.Event()
+
+    def do_GET(self):
+        PageHandler.requested.set()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(b"<html><body>benchmark</body></html>")
+
+    def log_message(self, *args):
+        pass
+
+
+def launch(browser: str, profile_dir: str, url: str, headless: bool):
+    command = [
+        browser,
+        f"--user-data-dir={profile_dir}",
+        "--no-default-browser-check",
+        "--no-first-run",
+        "--disable-sync",
+    ]
+    if headless:
+        command.append("--headless=new")
+    command.append(f"--app={url}")
+
+    PageHandler.requested.clear()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    PageHandler.requested.wait(timeout=60)
+    elapsed = time.perf_counter() - start
+
+    process.terminate()
+    process.wait()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--browser", default=None)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args()
+
+    browser = (
+        args.browser
+        or flaskwebgui.browser_path_dispacher[flaskwebgui.OPERATING_SYSTEM]()
+    )
+    if browser is None:
+        sys.exit("No browser found, pass --browser")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    workdir = tempfile.mkdtemp(prefix="flaskwebgui-bench")
+    template_dir = os.path.join(workdir, "template")
+    results = {"empty": [], "cloned": [], "clone_seconds": []}
+
+    try:
+        seed_dir = os.path.join(workdir, "seed")
+        launch(browser, seed_dir, url, args.headless)
+        flaskwebgui.seed_profile_template(seed_dir, template_dir)
+
+        for run in range(args.runs):
+            empty_dir = os.path.join(workdir, f"empty{run}")
+            results["empty"].append(launch(browser, empty_dir, url, args.headless))
+
+            cloned_dir = os.path.join(workdir, f"cloned{run}")
+            results["clone_seconds"].append(
+                flaskwebgui.clone_profile(template_dir, cloned_dir)
+            )
+            results["cloned"].append(launch(browser, cloned_dir, url, args.headless))
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "browser": browser,
+        "runs": args.runs,
+        "reflink": flaskwebgui.FLASKWEBGUI_REFLINK_SUPPORTED,
+        **{f"{key}_min": min(values) for key, values in results.items()},
+        **{f"{key}_avg": sum(values) / len(values) for key, values in results.items()},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Hot path overhead of the `route_metrics` middleware.
+
+Usage: python benchmarks/route_metrics.py [--requests 200000] [--repeat 5]
+                                          [--threads 4] [--output results.json]
+
+The same request is sent many times straight to the app callable (no server,
+no sockets) with and without the metrics middleware, the difference is the
+cost added to each request. Reported in microseconds per request (best of
+`--repeat` rounds):
+
+- wsgi / asgi: minimal WSGI and ASGI apps, the bare cost of the middleware;
+- flask / fastapi: real apps through their own request handling (for
+  Flask this includes the hook keeping the matched url rule), skipped when
+  the package is not installed. Their run-to-run noise (several us, more
+  for FastAPI sync endpoints which run in a thread pool) is larger than
+  the middleware cost, look at the wsgi / asgi rows for that;
+- wsgi_threads: the WSGI app called from `--threads` threads at once, to
+  show the cost of the shared lock under contention;
+- record: `RouteMetrics.record` alone.
+
+Prints a JSON report, compare two versions with the JSON written by `--output`.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import flaskwebgui  # noqa: E402
+
+
+def wsgi_app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"ok"]
+
+
+async def asgi_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def create_flask_app():
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.add_url_rule("/items/<int:item_id>", "item", lambda item_id: "ok")
+    return app
+
+
+def create_fastapi_app():
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+
+    app = FastAPI()
+    app.get("/items/{item_id}", response_class=PlainTextResponse)(lambda item_id: "ok")
+    return app
+
+
+def wsgi_environ():
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/items/42",
+        "QUERY_STRING": "",
+        "SERVER_NAME": "127.0.0.1",
+        "SERVER_PORT": "8000",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": None,
+        "wsgi.errors": sys.stderr,
+    }
+
+
+def time_wsgi(app, requests: int):
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        body = app(wsgi_environ(), start_response)
+        for _ in body:
+            pass
+        close = getattr(body, "close", None)
+        if close is not None:
+            close()
+    return time.perf_counter() - start
+
+
+def time_asgi(app, requests: int):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/items/42",
+        "raw_path": b"/items/42",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "server": ("127.0.0.1", 8000),
+        "client": ("127.0.0.1", 50000),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def run():
+        start = time.perf_counter()
+        for _ in range(requests):
+            await app(dict(scope), receive, send)
+        return time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def time_threads(app, requests: int, threads: int):
+    workers = [
+        threading.Thread(target=time_wsgi, args=(app, requests // threads))
+        for _ in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def time_record(requests: int):
+    metrics = flaskwebgui.RouteMetrics()
+    start = time.perf_counter()
+    for i in range(requests):
+        metrics.start()
+        metrics.record("GET /items/<int:item_id>", (i % 100) / 1000)
+    return time.perf_counter() - start
+
+
+def compare(
+    run, bare: object, measured: object, requests: int, repeat: int, toggle=None
+):
+    # Interleaved so both see the same machine load and CPU frequency
+    bare_seconds = measured_seconds = float("inf")
+    for _ in range(repeat):
+        if toggle is not None:
+            toggle(False)
+        bare_seconds = min(bare_seconds, run(bare, requests))
+        if toggle is not None:
+            toggle(True)
+        measured_seconds = min(measured_seconds, run(measured, requests))
+    bare_us = bare_seconds / requests * 1e6
+    measured_us = measured_seconds / requests * 1e6
+    return {
+        "bare_us": round(bare_us, 3),
+        "measured_us": round(measured_us, 3),
+        "overhead_us": round(measured_us - bare_us, 3),
+    }
+
+
+def measure_framework(create_app, interface: str, requests: int, repeat: int):
+    try:
+        app = create_app()
+    except ModuleNotFoundError as ex:
+        return {"skipped": str(ex)}
+
+    # The same app object with and without metrics, two instances of the
+    # same app differ by more than the middleware costs
+    metrics = flaskwebgui.RouteMetrics()
+    if hasattr(app, "wsgi_app"):
+        bare = app.wsgi_app
+        flaskwebgui.track_flask_routes(app)
+        hooks = app.before_request_funcs[None]
+        hook = hooks.pop(0)
+
+        def toggle(enabled: bool):
+            if enabled:
+                hooks.insert(0, hook)
+            elif hook in hooks:
+                hooks.remove(hook)
+
+        measured = flaskwebgui.RouteMetricsMiddleware(bare, metrics)
+    else:
+        bare = app
+        measured = flaskwebgui.AsgiRouteMetricsMiddleware(app, metrics)
+        toggle = None
+
+    run = time_asgi if interface == "asgi" else time_wsgi
+    result = compare(run, bare, measured, requests, repeat, toggle)
+    result["routes"] = list(metrics.to_dict()["routes"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    # Frameworks do a lot more per request, fewer requests give the same precision
+    framework_requests = max(args.requests // 10, 1)
+
+    metrics = flaskwebgui.RouteMetrics()
+    results = {
+        "wsgi": compare(
+            time_wsgi,
+            wsgi_app,
+            flaskwebgui.RouteMetricsMiddleware(wsgi_app, metrics),
+            args.requests,
+            args.repeat,
+        ),
+        "asgi": compare(
+            time_asgi,
+            asgi_app,
+            flaskwebgui.AsgiRouteMetricsMiddleware(asgi_app, metrics),
+            args.requests,
+            args.repeat,
+        ),
+        "flask": measure_framework(
+            create_flask_app, "wsgi", framework_requests, args.repeat
+        ),
+        "fastapi": measure_framework(
+            create_fastapi_app, "asgi", framework_requests, args.repeat
+        ),
+        "wsgi_threads": compare(
+            lambda app, requests: time_threads(app, requests, args.threads),
+            wsgi_app,
+            flaskwebgui.RouteMetricsMiddleware(wsgi_app, metrics),
+            args.requests,
+            args.repeat,
+        ),
+        "record_us": round(
+            min(time_record(args.requests) for _ in range(args.repeat))
+            / args.requests
+            * 1e6,
+            3,
+        ),
+    }
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "threads": args.threads,
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
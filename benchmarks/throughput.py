@@ -0,0 +1,85 @@
+"""
+Throughput of a CPU bound app served by the default flask server with 1..N workers.
+
+Usage: python benchmarks/throughput.py [--workers 1,2,4] [--requests 400] [--concurrency 16]
+
+Needs waitress (or werkzeug). Prints a JSON report with requests/second per
+worker count, on a multi core machine it should grow with the workers.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import flaskwebgui  # noqa: E402
+
+
+def cpu_bound_app(environ, start_response):
+    total = sum(i * i for i in range(200_000))
+    body = str(total).encode()
+    start_response(
+        "200 OK", [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))]
+    )
+    return [body]
+
+
+def measure(workers: int, requests: int, concurrency: int, threads: int):
+    sock = flaskwebgui.create_listening_socket()
+    port = sock.getsockname()[1]
+    server = flaskwebgui.ServerWorkers(
+        flaskwebgui.DefaultServerFlask.server,
+        {"app": cpu_bound_app, "sock": sock, "threads": threads},
+        workers,
+    )
+    server.start()
+
+    try:
+        flaskwebgui.wait_for_server(port, health_route="/")
+        url = f"http://127.0.0.1:{port}/"
+
+        def fetch(_):
+            with urllib.request.urlopen(url, timeout=60) as response:
+                return response.status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            statuses = list(pool.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.kill()
+        server.join()
+        sock.close()
+
+    return {
+        "workers": workers,
+        "requests": requests,
+        "errors": sum(status != 200 for status in statuses),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count()}")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    workers = sorted({int(count) for count in args.workers.split(",")})
+    results = [
+        measure(count, args.requests, args.concurrency, args.threads)
+        for count in workers
+    ]
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import torch
 from flask import Flask, request
 from flask import render_template
-from flaskwebgui import FlaskUI, close_application
+from flaskwebgui import FlaskUI, close_application, offload
 from torchvision import transforms
 from PIL import Image
 
@@ -9,12 +9,12 @@ from PIL import Image
 app = Flask(__name__)
 
 
-@app.route("/")
-def hello():
+# Runs in a process pool worker so the window doesn't freeze
+@offload
+def transform_image(imgpath: str):
     x = torch.rand(5, 3)
     print("Random array with torch: ", x)
 
-    imgpath = "big-image-unsplash.jpg"
     img = Image.open(imgpath)
 
     transform = transforms.Compose([
@@ -29,6 +29,10 @@ def hello():
 
     print("Image resized with torchvision")
 
+
+@app.route("/")
+def hello():
+    transform_image("big-image-unsplash.jpg")
     return render_template("index.html")
 
 
@@ -73,6 +77,8 @@ if __name__ == "__main__":
         height=600,
         on_startup=lambda: print("helooo"),
         on_shutdown=lambda: print("byee"),
+        process_pool_size=2,
+        process_pool_preload=["torch", "torchvision.transforms", "PIL.Image"],
     ).run()
 
     # Default start flask with custom kwargs
@@ -1,40 +1,56 @@
 import os
-import shutil
+import sys
 import time
-import uuid
-import signal
-import psutil
 import logging
-import tempfile
 import platform
-import subprocess
-import socketserver
-import multiprocessing
-from multiprocessing import Process
+import threading
+from bisect import bisect_left
+from functools import lru_cache
 from threading import Thread
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Union
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Union
 
+# Heavy modules are imported where they are used, importing flaskwebgui
+# must stay cheap and free of side effects (see benchmarks/import_time.py)
+if TYPE_CHECKING:
+    import psutil
+    from multiprocessing import Process
 
-logger = logging.getLogger('flaskwebgui')
-if not logger.handlers:
-    log_level_str = os.environ.get('FLASKWEBGUI_LOG_LEVEL', 'DEBUG').upper()
+
+logger = logging.getLogger("flaskwebgui")
+
+
+def configure_logging():
+    # Only our own logger is configured and only if nobody configured logging yet
+    if logger.handlers or logging.getLogger().handlers:
+        return
+    log_level_str = os.environ.get("FLASKWEBGUI_LOG_LEVEL", "DEBUG").upper()
     log_level = getattr(logging, log_level_str, logging.WARNING)
-    logging.basicConfig(level=log_level, format='[FLASKWEBGUI] %(levelname)s - %(asctime)s - %(message)s')
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        logging.Formatter("[FLASKWEBGUI] %(levelname)s - %(asctime)s - %(message)s")
+    )
+    logger.addHandler(handler)
+    logger.setLevel(log_level)
+    logger.propagate = False
 
 
 FLASKWEBGUI_USED_PORT = None
 FLASKWEBGUI_BROWSER_PROCESS = None
+FLASKWEBGUI_SERVER_PROCESS = None
+FLASKWEBGUI_UI = None
+FLASKWEBGUI_SERVER_STOP = None
+FLASKWEBGUI_RELOAD_CHILD = False
+FLASKWEBGUI_PROCESS_POOL = None
+FLASKWEBGUI_POOL_WORKER = False
+FLASKWEBGUI_POOL_BARRIER = None
+# Lock files we hold open, by path
+FLASKWEBGUI_LOCKS: Dict[str, int] = {}
 
 OPERATING_SYSTEM = platform.system().lower()
 PY = "python3" if OPERATING_SYSTEM in ["linux", "darwin"] else "python"
 
-try:
-    if OPERATING_SYSTEM == "darwin":
-        multiprocessing.set_start_method("fork")
-except Exception as ex:
-    logger.warning(f"Could not set start method 'fork' for mac: {ex}")
-
 
 linux_browser_paths = [
     r"/usr/bin/google-chrome",
@@ -57,109 +73,2884 @@ linux_browser_paths = [
     r"/snap/bin/microsoft-edge",
 ]
 
-mac_browser_paths = [
-    r"/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
-    r"/Applications/Brave Browser.app/Contents/MacOS/Brave Browser",
-    r"/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge",
-]
+mac_browser_paths = [
+    r"/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    r"/Applications/Brave Browser.app/Contents/MacOS/Brave Browser",
+    r"/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge",
+]
+
+windows_browser_paths = [
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
+    r"C:\Program Files\Microsoft\Edge\Application\msedge.exe",
+    r"C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe",
+]
+
+
+def get_free_port():
+    import socket
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("localhost", 0))
+        free_port = s.getsockname()[1]
+    return free_port
+
+
+def create_listening_socket(port: int = 0, host: str = "127.0.0.1"):
+    """Bind and listen on `port` (0 for a free one) and keep the socket.
+
+    Handing this socket to the server avoids the race of `get_free_port`
+    where another process can grab the port before the server binds it.
+    """
+    import socket
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if OPERATING_SYSTEM == "windows":
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+    else:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+    try:
+        sock.bind((host, port))
+        sock.listen(socket.SOMAXCONN)
+    except OSError:
+        sock.close()
+        raise
+
+    return sock
+
+
+def wait_for_server(
+    port: int,
+    host: str = "127.0.0.1",
+    timeout: float = 30,
+    health_route: str = None,
+    interval: float = 0.01,
+    max_interval: float = 0.25,
+    is_alive: Callable[[], bool] = None,
+):
+    """Poll until the server accepts connections (or answers `health_route`).
+
+    Retries back off exponentially from `interval` up to `max_interval`.
+    Returns the seconds waited or None if `timeout` expired first or
+    `is_alive()` returned False (the server process died).
+    """
+    import socket
+    import urllib.request
+
+    start = time.perf_counter()
+    delay = interval
+
+    while True:
+        try:
+            if health_route is None:
+                with socket.create_connection((host, port), timeout=max_interval):
+                    return time.perf_counter() - start
+            else:
+                url = f"http://{host}:{port}/{health_route.lstrip('/')}"
+                with urllib.request.urlopen(url, timeout=max_interval):
+                    return time.perf_counter() - start
+        except OSError:
+            pass
+
+        elapsed = time.perf_counter() - start
+        if elapsed >= timeout or (is_alive is not None and not is_alive()):
+            return None
+
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, max_interval)
+
+
+def kill_port(port: int, processes: List["psutil.Process"] = None):
+    """SIGTERM the processes listening on `port`.
+
+    Only our own process tree is searched unless `processes` is given,
+    scanning every process on the machine is way too slow.
+    """
+    import signal
+    import psutil
+
+    if processes is None:
+        current = psutil.Process()
+        processes = [current] + current.children(recursive=True)
+
+    killed = False
+    for proc in processes:
+        try:
+            for conns in proc.net_connections(kind="inet"):
+                if conns.laddr.port == port:
+                    proc.send_signal(signal.SIGTERM)
+                    killed = True
+                    break
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            continue
+
+    return killed
+
+
+def stop_server(
+    server_process: Union[Thread, "Process"], port: int, owned: bool = False
+):
+    """Stop the server we started.
+
+    `owned` means the server runs inside `server_process` (default servers),
+    otherwise the server may have spawned children which hold the port.
+    """
+    if isinstance(server_process, Thread):
+        if not server_process.is_alive():
+            return
+        if not owned:
+            import psutil
+
+            children = psutil.Process().children(recursive=True)
+            if kill_port(port, children):
+                return
+        import signal
+
+        os.kill(os.getpid(), signal.SIGTERM)
+        return
+
+    if server_process is not None:
+        server_process.kill()
+        return
+
+    # We don't know who started the server, last resort
+    kill_port(port)
+
+
+def drain_server(server_process: Union[Thread, "Process"], timeout: float = 5):
+    """Ask a default server to stop accepting, answer in-flight requests and exit.
+
+    Servers in a thread are stopped with the function they registered with
+    `register_server_stop`, server processes with SIGTERM. Returns True if
+    the server exited within `timeout` (plus a second to close).
+    """
+    if not server_process.is_alive():
+        return True
+
+    if isinstance(server_process, Thread):
+        if FLASKWEBGUI_SERVER_STOP is None:
+            return False
+        FLASKWEBGUI_SERVER_STOP()
+    else:
+        server_process.terminate()
+
+    server_process.join(timeout + 1)
+    return not server_process.is_alive()
+
+
+def close_application():
+    # FlaskUI.run takes care of the shutdown when it's running
+    if FLASKWEBGUI_UI is not None and FLASKWEBGUI_UI.lifecycle.state != "stopped":
+        FLASKWEBGUI_UI.request_stop("close_application")
+        return
+
+    if FLASKWEBGUI_RELOAD_CHILD:
+        import signal
+
+        # The parent turns SIGTERM into a clean shutdown
+        os.kill(os.getppid(), signal.SIGTERM)
+        return
+
+    if FLASKWEBGUI_BROWSER_PROCESS is not None:
+        FLASKWEBGUI_BROWSER_PROCESS.terminate()
+
+    stop_server(FLASKWEBGUI_SERVER_PROCESS, FLASKWEBGUI_USED_PORT)
+
+
+profile_cache_dirs = [
+    "Default/Cache",
+    "Default/Code Cache",
+    "Default/GPUCache",
+    "Default/DawnGraphiteCache",
+    "Default/DawnWebGPUCache",
+    "GrShaderCache",
+    "GraphiteDawnCache",
+    "ShaderCache",
+    "component_crx_cache",
+]
+
+
+def get_cache_dir():
+    if OPERATING_SYSTEM == "windows":
+        import tempfile
+
+        base = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+    elif OPERATING_SYSTEM == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "flaskwebgui")
+
+
+def get_app_id(prefix: str = "flaskwebgui"):
+    import hashlib
+
+    # Frozen apps (pyinstaller) have a stable executable, scripts a stable main file
+    entrypoint = sys.executable if getattr(sys, "frozen", False) else sys.argv[0]
+    digest = hashlib.sha1(os.path.abspath(entrypoint).encode()).hexdigest()[:12]
+    return f"{prefix}-{digest}"
+
+
+def get_lock_owner(lock_path: str):
+    """Pid of the live process holding `lock_path` or None if the lock is stale."""
+    import psutil
+
+    try:
+        with open(lock_path) as f:
+            pid = int(f.read().strip() or 0)
+        locked_at = os.path.getmtime(lock_path)
+        # A recycled pid belongs to a process started after the lock was taken
+        if pid and psutil.Process(pid).create_time() <= locked_at + 1:
+            return pid
+    except (OSError, ValueError, psutil.Error):
+        pass
+    return None
+
+
+def acquire_lock(lock_path: str):
+    """Create `lock_path` holding our pid, taking over locks of dead processes.
+
+    The file stays open while we hold the lock. On Linux/Mac it is also
+    flock'ed, the kernel drops it when we die, so whoever gets the flock owns
+    the lock and a stale one is taken over without removing it. On Windows
+    an open file can't be removed, only locks of dead processes are.
+    """
+    if lock_path in FLASKWEBGUI_LOCKS:
+        return True
+
+    pid = get_lock_owner(lock_path)
+    if pid is not None and pid != os.getpid():
+        return False
+
+    if OPERATING_SYSTEM == "windows":
+        fd = create_lock_windows(lock_path)
+    else:
+        fd = create_lock_posix(lock_path)
+    if fd is None:
+        return False
+
+    os.write(fd, str(os.getpid()).encode())
+    FLASKWEBGUI_LOCKS[lock_path] = fd
+    return True
+
+
+def create_lock_posix(lock_path: str):
+    import fcntl
+
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        except OSError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+
+        # The previous owner may have removed the file we opened, lock the new one
+        try:
+            if os.path.samestat(os.fstat(fd), os.stat(lock_path)):
+                os.ftruncate(fd, 0)
+                return fd
+        except OSError:
+            pass
+        os.close(fd)
+
+
+def create_lock_windows(lock_path: str):
+    for _ in range(2):
+        try:
+            return os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        except FileExistsError:
+            # Fails while the owner holds the file open
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                return None
+        except OSError:
+            return None
+    return None
+
+
+def release_lock(lock_path: str):
+    fd = FLASKWEBGUI_LOCKS.pop(lock_path, None)
+    if fd is None:
+        return
+    # Removed while still locked on Linux/Mac, waiters see the file changed
+    # under them, Windows can only remove it once closed
+    if OPERATING_SYSTEM == "windows":
+        os.close(fd)
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass
+    if OPERATING_SYSTEM != "windows":
+        os.close(fd)
+
+
+class InstanceServer:
+    """Local endpoint other launches of the same app use to reach this one.
+
+    The port and a random token are written to `instance_path` (readable only
+    by the user), requests are one JSON line with the token, answered with
+    one JSON line returned by `handler(request)`.
+    """
+
+    def __init__(self, instance_path: str, handler: Callable[[dict], dict]):
+        import json
+        import secrets
+
+        self.instance_path = instance_path
+        self.handler = handler
+        self.token = secrets.token_hex(16)
+        self.socket = create_listening_socket()
+
+        endpoint = {
+            "pid": os.getpid(),
+            "port": self.socket.getsockname()[1],
+            "token": self.token,
+        }
+        # Write then rename so readers never see a partial file
+        temp_path = f"{instance_path}.{os.getpid()}"
+        fd = os.open(temp_path, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(endpoint, f)
+        os.replace(temp_path, instance_path)
+
+        self.thread = Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.socket.accept()
+            except OSError:
+                return
+            with conn:
+                try:
+                    self.answer(conn)
+                except (OSError, ValueError):
+                    continue
+
+    def answer(self, conn):
+        import hmac
+        import json
+
+        conn.settimeout(2)
+        request = json.loads(conn.makefile().readline())
+        if not hmac.compare_digest(str(request.get("token")), self.token):
+            reply = {"ok": False, "error": "invalid token"}
+        else:
+            reply = self.handler(request)
+        conn.sendall(json.dumps(reply).encode() + b"\n")
+
+    def close(self):
+        import json
+
+        self.socket.close()
+        try:
+            with open(self.instance_path) as f:
+                if json.load(f).get("pid") == os.getpid():
+                    os.remove(self.instance_path)
+        except (OSError, ValueError):
+            pass
+
+
+def send_instance_request(instance_path: str, request: dict, timeout: float = 2):
+    """Send `request` to the instance described in `instance_path`, None if it doesn't answer."""
+    import json
+    import socket
+
+    deadline = time.perf_counter() + timeout
+    delay = 0.01
+    while True:
+        try:
+            # The running instance may still be writing its endpoint
+            with open(instance_path) as f:
+                endpoint = json.load(f)
+            address = ("127.0.0.1", endpoint["port"])
+            with socket.create_connection(address, timeout=timeout) as conn:
+                message = {**request, "token": endpoint["token"]}
+                conn.sendall(json.dumps(message).encode() + b"\n")
+                return json.loads(conn.makefile().readline())
+        except (OSError, ValueError, KeyError):
+            if time.perf_counter() + delay > deadline:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+
+def remove_dir_in_background(path: str):
+    """Rename `path` out of the way and delete it without blocking the caller.
+
+    The deletion runs in a detached process so it completes after we exit,
+    in a thread for frozen apps (their executable is not a python). If the
+    deletion did not finish the `.trash` leftovers are removed by
+    `sweep_stale_profiles` on the next start.
+    """
+    import shutil
+    import subprocess
+
+    trash = f"{path}.trash"
+    try:
+        os.rename(path, trash)
+    except OSError:
+        trash = path
+
+    if not getattr(sys, "frozen", False):
+        kwargs = {"start_new_session": True}
+        if OPERATING_SYSTEM == "windows":
+            kwargs = {
+                "creationflags": subprocess.DETACHED_PROCESS
+                | subprocess.CREATE_NEW_PROCESS_GROUP
+            }
+        try:
+            return subprocess.Popen(
+                [
+                    sys.executable,
+                    "-c",
+                    "import sys, shutil; shutil.rmtree(sys.argv[1], ignore_errors=True)",
+                    trash,
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                **kwargs,
+            )
+        except OSError:
+            pass
+
+    thread = Thread(target=shutil.rmtree, args=(trash,), kwargs={"ignore_errors": True})
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def is_stale_profile(profile_dir: str, min_age: float = 3600):
+    import psutil
+
+    if profile_dir.endswith(".trash"):
+        return True
+
+    lock_path = os.path.join(profile_dir, "flaskwebgui.lock")
+    if os.path.exists(lock_path):
+        return get_lock_owner(lock_path) is None
+
+    # Profiles from older versions have no lock, rely on the browser lock or age
+    try:
+        singleton = os.readlink(os.path.join(profile_dir, "SingletonLock"))
+        return not psutil.pid_exists(int(singleton.rsplit("-", 1)[-1]))
+    except (OSError, ValueError):
+        pass
+
+    try:
+        return time.time() - os.path.getmtime(profile_dir) > min_age
+    except OSError:
+        return False
+
+
+def sweep_stale_profiles(
+    prefix: str = "flaskwebgui", directory: str = None, time_budget: float = 5
+):
+    """Remove temporary profiles left behind by crashed or killed instances.
+
+    Only names made by `FlaskUI.get_profile_dir` (`prefix` + uuid hex) are
+    considered. Stops after `time_budget` seconds, whatever is left is
+    swept next time.
+    """
+    import re
+    import shutil
+    import tempfile
+
+    directory = directory or tempfile.gettempdir()
+    deadline = time.perf_counter() + time_budget
+    removed = 0
+    pattern = re.compile(re.escape(prefix) + r"[0-9a-f]{32}(\.trash)?")
+
+    try:
+        entries = [e for e in os.scandir(directory) if pattern.fullmatch(e.name)]
+    except OSError:
+        return removed
+
+    for entry in entries:
+        if time.perf_counter() > deadline:
+            logger.info(f"Stale profile sweep stopped after {time_budget}s")
+            break
+        if not entry.is_dir(follow_symlinks=False) or not is_stale_profile(entry.path):
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+
+    if removed:
+        logger.info(f"Removed {removed} stale profiles from {directory}")
+    return removed
+
+
+def get_dir_size(path: str):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def trim_profile_cache(profile_dir: str, max_size_mb: int):
+    """Evict the oldest cache subdirectories until they fit in `max_size_mb`."""
+    import shutil
+
+    caches = []
+    for subdir in profile_cache_dirs:
+        path = os.path.join(profile_dir, subdir)
+        if os.path.isdir(path):
+            caches.append((os.path.getmtime(path), get_dir_size(path), path))
+
+    total = sum(size for _, size, _ in caches)
+    for _, size, path in sorted(caches):
+        if total <= max_size_mb * 1024 * 1024:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        logger.info(f"Evicted profile cache {path} ({size / 1024 / 1024:.1f}MB)")
+
+
+profile_template_ignore = [
+    "Singleton*",
+    "lockfile",
+    "flaskwebgui.lock",
+    "Crashpad",
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "DawnGraphiteCache",
+    "DawnWebGPUCache",
+    "GrShaderCache",
+    "GraphiteDawnCache",
+    "ShaderCache",
+    "component_crx_cache",
+    # What the user did in the app, a template must not share it between profiles
+    "Cookies*",
+    "Network",
+    "Local Storage",
+    "Session Storage",
+    "IndexedDB",
+    "Service Worker",
+    "File System",
+    "blob_storage",
+    "databases",
+    "Sessions",
+    "Current Session",
+    "Current Tabs",
+    "Last Session",
+    "Last Tabs",
+    "History*",
+    "Visited Links",
+    "Top Sites*",
+    "Favicons*",
+    "Shortcuts*",
+    "Login Data*",
+    "Web Data*",
+]
+
+FICLONE = 0x40049409
+FLASKWEBGUI_REFLINK_SUPPORTED = None
+
+
+def clone_file(src: str, dst: str):
+    """Copy-on-write clone of `src` where the filesystem supports it, else copy.
+
+    Hardlinks are not an option here, the browser rewrites its sqlite
+    databases in place and would change the template as well.
+    """
+    import shutil
+
+    global FLASKWEBGUI_REFLINK_SUPPORTED
+
+    if FLASKWEBGUI_REFLINK_SUPPORTED is not False and OPERATING_SYSTEM == "linux":
+        import fcntl
+
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            FLASKWEBGUI_REFLINK_SUPPORTED = True
+            shutil.copystat(src, dst)
+            return dst
+        except OSError:
+            FLASKWEBGUI_REFLINK_SUPPORTED = False
+
+    if FLASKWEBGUI_REFLINK_SUPPORTED is not False and OPERATING_SYSTEM == "darwin":
+        import ctypes
+
+        try:
+            clonefile = ctypes.CDLL(None, use_errno=True).clonefile
+            if clonefile(src.encode(), dst.encode(), 0) == 0:
+                FLASKWEBGUI_REFLINK_SUPPORTED = True
+                return dst
+        except AttributeError:
+            pass
+        FLASKWEBGUI_REFLINK_SUPPORTED = False
+
+    return shutil.copy2(src, dst)
+
+
+def clone_profile(template_dir: str, profile_dir: str):
+    import shutil
+
+    start = time.perf_counter()
+    shutil.copytree(
+        template_dir,
+        profile_dir,
+        copy_function=clone_file,
+        ignore=shutil.ignore_patterns(*profile_template_ignore),
+        symlinks=True,
+        dirs_exist_ok=True,
+    )
+    return time.perf_counter() - start
+
+
+def seed_profile_template(profile_dir: str, template_dir: str):
+    """Copy `profile_dir` to `template_dir`, it should come from a clean launch."""
+    import uuid
+    import shutil
+
+    # Copy next to the template and rename so a half written template is never used
+    tmp_dir = f"{template_dir}.{uuid.uuid4().hex}"
+    try:
+        shutil.copytree(
+            profile_dir,
+            tmp_dir,
+            ignore=shutil.ignore_patterns(*profile_template_ignore),
+            symlinks=True,
+        )
+        os.rename(tmp_dir, template_dir)
+        logger.info(f"Seeded profile template {template_dir}")
+    except OSError as ex:
+        logger.warning(f"Could not seed profile template {template_dir}: {ex}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def seed_profile_template_from_browser(
+    browser_path: str, template_dir: str, timeout: float = 30
+):
+    """Seed `template_dir` from a headless launch of the browser on a blank page.
+
+    The app profile is not used, it holds the user's logins and app state.
+    """
+    import uuid
+    import shutil
+    import subprocess
+
+    os.makedirs(os.path.dirname(template_dir), exist_ok=True)
+    seed_dir = f"{template_dir}.seed{uuid.uuid4().hex}"
+    command = [
+        browser_path,
+        f"--user-data-dir={seed_dir}",
+        "--headless=new",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--disable-sync",
+        "about:blank",
+    ]
+
+    try:
+        process = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    except OSError as ex:
+        logger.warning(f"Could not seed profile template {template_dir}: {ex}")
+        return
+
+    # The first run initialization is done once Local State is written
+    deadline = time.perf_counter() + timeout
+    local_state = os.path.join(seed_dir, "Local State")
+    while not os.path.exists(local_state) and process.poll() is None:
+        if time.perf_counter() > deadline:
+            break
+        time.sleep(0.1)
+    time.sleep(1)
+
+    process.terminate()
+    try:
+        process.wait(5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+    if os.path.exists(local_state) and not os.path.isdir(template_dir):
+        seed_profile_template(seed_dir, template_dir)
+    shutil.rmtree(seed_dir, ignore_errors=True)
+
+
+browser_executable_names = [
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "microsoft-edge",
+    "microsoft-edge-stable",
+    "brave-browser",
+    "chrome",
+    "msedge",
+    "brave",
+]
+
+browser_path_env_vars = ["FLASKWEBGUI_BROWSER_PATH", "CHROME_PATH"]
+
+os_browser_paths = {
+    "windows": windows_browser_paths,
+    "linux": linux_browser_paths,
+    "darwin": mac_browser_paths,
+}
+
+FLASKWEBGUI_BROWSER = None
+
+
+@dataclass
+class BrowserInfo:
+    path: str = None
+    version: str = None
+    candidates: List[str] = field(default_factory=list)
+    cached: bool = False
+
+
+def find_browser_in_paths(browser_paths: List[str]):
+    for path in browser_paths:
+        if os.path.exists(path):
+            return path
+
+
+def get_browser_candidates(os_name: str = OPERATING_SYSTEM):
+    """Browser paths in the order they are tried: env overrides, known paths, PATH."""
+    import shutil
+
+    candidates = [
+        os.environ[var] for var in browser_path_env_vars if os.environ.get(var)
+    ]
+    candidates.extend(os_browser_paths.get(os_name, []))
+
+    for name in browser_executable_names:
+        path = shutil.which(name)
+        if path is not None:
+            candidates.append(path)
+
+    return list(dict.fromkeys(candidates))
+
+
+def get_browser_version(browser_path: str):
+    import subprocess
+
+    # On Windows `chrome.exe --version` opens a browser window instead
+    if OPERATING_SYSTEM == "windows":
+        return None
+
+    try:
+        output = subprocess.run(
+            [browser_path, "--version"], capture_output=True, text=True, timeout=5
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.strip() or None
+
+
+def read_browser_cache(cache_path: str):
+    import json
+
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if os.stat(cache["path"]).st_mtime == cache["mtime"]:
+            return cache
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_browser_cache(cache_path: str, browser: BrowserInfo):
+    import json
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "path": browser.path,
+                    "version": browser.version,
+                    "mtime": os.stat(browser.path).st_mtime,
+                },
+                f,
+            )
+        os.replace(tmp_path, cache_path)
+    except OSError as ex:
+        logger.debug(f"Could not write browser cache {cache_path}: {ex}")
+
+
+def discover_browser(os_name: str = OPERATING_SYSTEM, use_cache: bool = True):
+    """Find a chromium based browser, remembering the result on disk.
+
+    The cached browser is reused while its executable is unchanged (same
+    mtime), an env override (FLASKWEBGUI_BROWSER_PATH, CHROME_PATH) always wins.
+    """
+    global FLASKWEBGUI_BROWSER
+
+    env_override = [
+        os.environ[var] for var in browser_path_env_vars if os.environ.get(var)
+    ]
+    cache_path = os.path.join(get_cache_dir(), f"browser-{os_name}.json")
+
+    if use_cache and not env_override:
+        if FLASKWEBGUI_BROWSER is not None and os.path.exists(FLASKWEBGUI_BROWSER.path):
+            return FLASKWEBGUI_BROWSER
+
+        cache = read_browser_cache(cache_path)
+        if cache is not None:
+            FLASKWEBGUI_BROWSER = BrowserInfo(
+                path=cache["path"], version=cache["version"], cached=True
+            )
+            return FLASKWEBGUI_BROWSER
+
+    candidates = get_browser_candidates(os_name)
+    browser = BrowserInfo(path=find_browser_in_paths(candidates), candidates=candidates)
+
+    if browser.path is None:
+        logger.warning(
+            f"No browser found, tried: {', '.join(candidates)}. "
+            "Set `browser_path` or the FLASKWEBGUI_BROWSER_PATH environment variable"
+        )
+        return browser
+
+    browser.version = get_browser_version(browser.path)
+    logger.info(f"Found browser {browser.path} ({browser.version})")
+
+    if not env_override:
+        write_browser_cache(cache_path, browser)
+        FLASKWEBGUI_BROWSER = browser
+
+    return browser
+
+
+browser_path_dispacher: Dict[str, Callable[[], str]] = {
+    "windows": lambda: discover_browser("windows").path,
+    "linux": lambda: discover_browser("linux").path,
+    "darwin": lambda: discover_browser("darwin").path,
+}
+
+# Skip work a local app doesn't need: updaters, metrics, safe browsing lookups etc
+fast_start_flags = [
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-default-apps",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--disable-breakpad",
+    "--no-pings",
+    "--no-service-autorun",
+    "--metrics-recording-only",
+]
+
+# Chromium only reads the last --disable-features, keep one per preset
+browser_flag_presets: Dict[str, List[str]] = {
+    "default": [],
+    "fast_start": fast_start_flags
+    + [
+        "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication",
+    ],
+    "low_memory": fast_start_flags
+    + [
+        "--renderer-process-limit=1",
+        "--process-per-site",
+        "--disable-site-isolation-trials",
+        "--enable-low-end-device-mode",
+        "--disk-cache-size=10485760",
+        "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,BackForwardCache,SpareRendererForSitePerProcess",
+    ],
+}
+
+
+class Timeline:
+    """Startup/shutdown events with their offset from the timeline start."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float = None, **info):
+        event = {"name": name, "start": round(start - self.start, 6)}
+        if end is not None:
+            event["duration"] = round(end - start, 6)
+        event.update(info)
+        with self.lock:
+            self.events.append(event)
+        return event
+
+    def mark(self, name: str, **info):
+        return self.add(name, time.perf_counter(), **info)
+
+    @contextmanager
+    def measure(self, name: str, **info):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter(), **info)
+
+    def get(self, name: str):
+        with self.lock:
+            for event in self.events:
+                if event["name"] == name:
+                    return event
+        return None
+
+    def to_dict(self):
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event["start"])
+        return {"started_at": self.started_at, "events": events}
+
+    def save(self, path: str):
+        import json
+
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class Lifecycle:
+    """State of a FlaskUI run, driven by events instead of polling.
+
+    created -> starting   run() called, on_startup and server start
+    starting -> running   server ready (or startup_timeout) and browser opened
+    running -> stopping   first of: browser exit (if auto_close), server exit,
+                          SIGINT/SIGTERM/SIGBREAK, close_application()
+    stopping -> stopped   browser closed, on_shutdown, profile cleanup,
+                          server stopped
+
+    `request_stop` can be called from any state and any thread, the first
+    reason wins and `wait` returns right away.
+    """
+
+    states = ["created", "starting", "running", "stopping", "stopped"]
+
+    def __init__(self):
+        self.state = "created"
+        self.stop_reason = None
+        self.stop_requested = threading.Event()
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+
+    def set_state(self, state: str):
+        with self.lock:
+            if self.states.index(state) <= self.states.index(self.state):
+                return False
+            self.state = state
+        logger.debug(f"Lifecycle {state}")
+        if state == "stopped":
+            self.stopped.set()
+        return True
+
+    def request_stop(self, reason: str):
+        with self.lock:
+            if self.stop_reason is not None:
+                return
+            self.stop_reason = reason
+        logger.info(f"Stopping: {reason}")
+        self.stop_requested.set()
+
+    def wait(self):
+        # Windows can't interrupt a blocking wait with Ctrl+C, wake up for it
+        timeout = 0.5 if OPERATING_SYSTEM == "windows" else None
+        while not self.stop_requested.wait(timeout):
+            pass
+        return self.stop_reason
+
+    def install_signal_handlers(self):
+        import signal
+
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+
+        def handler(signum, frame):
+            # Locks are not safe inside a signal handler, hand it to a thread
+            Thread(
+                target=self.request_stop, args=(signal.Signals(signum).name,)
+            ).start()
+
+        previous = {}
+        for name in ["SIGINT", "SIGTERM", "SIGBREAK", "SIGHUP"]:
+            if hasattr(signal, name):
+                signum = getattr(signal, name)
+                previous[signum] = signal.signal(signum, handler)
+        return previous
+
+    def restore_signal_handlers(self, previous: Dict[int, Any]):
+        import signal
+
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def open_window(path: str = "/", width: int = None, height: int = None):
+    """Open another window of the running FlaskUI app (ex: from a route)."""
+    if FLASKWEBGUI_UI is None:
+        raise RuntimeError("No FlaskUI app is running")
+    return FLASKWEBGUI_UI.open_window(path, width, height)
+
+
+@dataclass
+class Window:
+    url: str
+    process: Any = None
+    target_id: str = None
+
+
+class DevTools:
+    """Minimal client for the browser DevTools HTTP endpoints.
+
+    Available when the browser was started with `--remote-debugging-port=0`,
+    the browser writes the port it picked in `DevToolsActivePort`.
+    """
+
+    def __init__(self, port: int, browser_path: str = None):
+        self.port = port
+        self.browser_path = browser_path
+
+    @classmethod
+    def from_profile(cls, profile_dir: str, timeout: float = 10):
+        path = os.path.join(profile_dir, "DevToolsActivePort")
+        deadline = time.perf_counter() + timeout
+        delay = 0.01
+
+        while True:
+            try:
+                with open(path) as f:
+                    lines = f.read().splitlines()
+                if len(lines) >= 2:
+                    return cls(int(lines[0]), lines[1])
+            except (OSError, ValueError):
+                pass
+
+            if time.perf_counter() > deadline:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    def request(self, path: str, method: str = "GET"):
+        import json
+        import urllib.request
+
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}{path}", method=method
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            body = response.read()
+        try:
+            return json.loads(body)
+        except ValueError:
+            return body.decode()
+
+    def list_pages(self):
+        return [t for t in self.request("/json/list") if t.get("type") == "page"]
+
+    def close_target(self, target_id: str):
+        return self.request(f"/json/close/{target_id}")
+
+    def activate_target(self, target_id: str):
+        return self.request(f"/json/activate/{target_id}")
+
+    def connect(self, target_id: str, timeout: float = 5):
+        url = f"ws://127.0.0.1:{self.port}/devtools/page/{target_id}"
+        return CdpConnection(url, timeout)
+
+    def send(self, target_id: str, method: str, params: dict = None):
+        """Run one DevTools protocol command on a page, ex: `Page.reload`."""
+        with self.connect(target_id) as connection:
+            return connection.call(method, params)
+
+
+class CdpConnection:
+    """DevTools protocol session over a minimal websocket client.
+
+    Enough for commands and their results, events received meanwhile are
+    kept in `events`.
+    """
+
+    def __init__(self, url: str, timeout: float = 5):
+        import base64
+        import socket
+        from urllib.parse import urlparse
+
+        address = urlparse(url)
+        self.socket = socket.create_connection(
+            (address.hostname, address.port), timeout=timeout
+        )
+        self.buffer = b""
+        self.last_id = 0
+        self.events: List[dict] = []
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.socket.sendall(
+            (
+                f"GET {address.path} HTTP/1.1\r\n"
+                f"Host: {address.hostname}:{address.port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n"
+            ).encode()
+        )
+        response = self.read_until(b"\r\n\r\n")
+        if not response.startswith(b"HTTP/1.1 101"):
+            self.socket.close()
+            raise ConnectionError(
+                f"DevTools refused the websocket: {response.splitlines()[0]!r}"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def receive(self, size: int = 65536):
+        chunk = self.socket.recv(size)
+        if not chunk:
+            raise ConnectionError("DevTools websocket closed")
+        self.buffer += chunk
+
+    def read_until(self, marker: bytes):
+        while marker not in self.buffer:
+            self.receive()
+        data, _, self.buffer = self.buffer.partition(marker)
+        return data
+
+    def read_exactly(self, size: int):
+        while len(self.buffer) < size:
+            self.receive()
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def send_frame(self, payload: bytes, opcode: int = 0x1):
+        import struct
+
+        # Client frames must be masked
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([0x80 | len(payload)])
+        elif len(payload) < 65536:
+            header += bytes([0x80 | 126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", len(payload))
+        mask = os.urandom(4)
+        masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        self.socket.sendall(header + mask + masked)
+
+    def read_message(self):
+        import struct
+
+        message = b""
+        while True:
+            first, second = self.read_exactly(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self.read_exactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self.read_exactly(8))[0]
+            mask = self.read_exactly(4) if second & 0x80 else None
+            payload = self.read_exactly(length)
+            if mask is not None:
+                payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+            if opcode == 0x8:
+                raise ConnectionError("DevTools websocket closed")
+            if opcode == 0x9:
+                self.send_frame(payload, 0xA)
+                continue
+            if opcode == 0xA:
+                continue
+
+            message += payload
+            if first & 0x80:
+                return message.decode()
+
+    def call(self, method: str, params: dict = None):
+        import json
+
+        self.last_id += 1
+        command = {"id": self.last_id, "method": method, "params": params or {}}
+        self.send_frame(json.dumps(command).encode())
+
+        while True:
+            message = json.loads(self.read_message())
+            if message.get("id") != self.last_id:
+                self.events.append(message)
+                continue
+            if "error" in message:
+                raise RuntimeError(
+                    f"{method} failed: {message['error'].get('message')}"
+                )
+            return message.get("result", {})
+
+    def close(self):
+        try:
+            self.send_frame(b"", 0x8)
+        except OSError:
+            pass
+        self.socket.close()
+
+
+LONG_TASKS_SCRIPT = """(() => {
+  if (window.__flaskwebgui_long_tasks) return;
+  const tasks = (window.__flaskwebgui_long_tasks = {count: 0, total: 0, max: 0, recent: []});
+  try {
+    new PerformanceObserver((list) => {
+      for (const entry of list.getEntries()) {
+        tasks.count += 1;
+        tasks.total += entry.duration;
+        tasks.max = Math.max(tasks.max, entry.duration);
+        tasks.recent.push({start: entry.startTime, duration: entry.duration});
+        if (tasks.recent.length > %d) tasks.recent.shift();
+      }
+    }).observe({type: "longtask", buffered: true});
+  } catch (error) {}
+})();"""
+
+PAGE_METRICS_EXPRESSION = """JSON.stringify((() => {
+  const navigation = performance.getEntriesByType("navigation")[0];
+  const paint = performance.getEntriesByName("first-contentful-paint")[0];
+  return {
+    url: location.href,
+    navigation: navigation ? navigation.toJSON() : null,
+    first_contentful_paint: paint ? paint.startTime : null,
+    long_tasks: window.__flaskwebgui_long_tasks || null,
+  };
+})())"""
+
+navigation_timings = {
+    "time_to_first_byte": "responseStart",
+    "response_end": "responseEnd",
+    "dom_interactive": "domInteractive",
+    "dom_content_loaded": "domContentLoadedEventEnd",
+    "load": "loadEventEnd",
+}
+
+
+class PageMetrics:
+    """Frontend performance of the app pages, read through DevTools.
+
+    `instrument(target_id)` keeps a DevTools session on the page which
+    observes long tasks in the current and next documents (reloads,
+    navigations), `collect(target_id)` returns navigation timing, first
+    contentful paint, JS heap and long tasks. Times are in seconds from the
+    navigation start.
+    """
+
+    def __init__(self, devtools: DevTools, max_long_tasks: int = 50):
+        self.devtools = devtools
+        self.script = LONG_TASKS_SCRIPT % max_long_tasks
+        self.sessions: Dict[str, CdpConnection] = {}
+        self.lock = threading.Lock()
+
+    def instrument(self, target_id: str):
+        with self.lock:
+            if target_id in self.sessions:
+                return
+            connection = self.devtools.connect(target_id)
+            try:
+                connection.call(
+                    "Page.addScriptToEvaluateOnNewDocument", {"source": self.script}
+                )
+                connection.call("Runtime.evaluate", {"expression": self.script})
+                connection.call("Performance.enable")
+            except (OSError, RuntimeError):
+                connection.close()
+                raise
+            connection.events.clear()
+            self.sessions[target_id] = connection
+
+    def collect(self, target_id: str):
+        import json
+
+        self.instrument(target_id)
+        with self.lock:
+            connection = self.sessions[target_id]
+            try:
+                heap = {
+                    metric["name"]: metric["value"]
+                    for metric in connection.call("Performance.getMetrics")["metrics"]
+                }
+                result = connection.call(
+                    "Runtime.evaluate",
+                    {"expression": PAGE_METRICS_EXPRESSION, "returnByValue": True},
+                )
+            except (OSError, RuntimeError):
+                # The page was closed, a new session is made if it comes back
+                connection.close()
+                del self.sessions[target_id]
+                raise
+            finally:
+                # Nothing reads the events, don't let them pile up
+                connection.events.clear()
+
+        page = json.loads(result["result"]["value"])
+        navigation = page["navigation"] or {}
+        long_tasks = page["long_tasks"] or {"count": 0, "total": 0, "max": 0}
+        seconds = lambda ms: round(ms / 1000, 6) if ms is not None else None
+
+        return {
+            "url": page["url"],
+            "navigation": {
+                name: seconds(navigation.get(key))
+                for name, key in navigation_timings.items()
+            },
+            "first_contentful_paint": seconds(page["first_contentful_paint"]),
+            "js_heap_used_mb": round(heap.get("JSHeapUsedSize", 0) / 1024 / 1024, 2),
+            "js_heap_total_mb": round(heap.get("JSHeapTotalSize", 0) / 1024 / 1024, 2),
+            "long_tasks": {
+                "count": long_tasks["count"],
+                "total_seconds": seconds(long_tasks["total"]),
+                "max_seconds": seconds(long_tasks["max"]),
+                "recent": [
+                    {
+                        "start": seconds(task["start"]),
+                        "duration": seconds(task["duration"]),
+                    }
+                    for task in long_tasks.get("recent", [])
+                ],
+            },
+        }
+
+    def forget(self, open_targets: List[str]):
+        """Close the sessions of pages which are not open anymore."""
+        with self.lock:
+            for target_id in list(self.sessions):
+                if target_id not in open_targets:
+                    self.sessions.pop(target_id).close()
+
+    def close(self):
+        self.forget([])
+
+
+def find_profile_processes(profile_dir: str):
+    import psutil
+
+    flag = f"--user-data-dir={profile_dir}"
+    processes = []
+    for proc in psutil.process_iter(["cmdline"]):
+        try:
+            if flag in (proc.info["cmdline"] or []):
+                processes.append(proc)
+        except psutil.Error:
+            continue
+    return processes
+
+
+def wait_browser_exit(process: Any, profile_dir: str, handoff_window: float = 5):
+    """Wait for the browser opened with `process` to exit.
+
+    A launcher which exits right away may have handed the window over to
+    another browser process using the same profile, wait for those as well.
+    """
+    import psutil
+
+    start = time.perf_counter()
+    returncode = process.wait()
+
+    if returncode == 0 and time.perf_counter() - start < handoff_window:
+        processes = find_profile_processes(profile_dir)
+        if processes:
+            logger.debug(f"Browser handed over to {[p.pid for p in processes]}")
+            psutil.wait_procs(processes)
+
+    return returncode
+
+
+class ResourceMonitor:
+    """Samples CPU and memory of groups of processes in a background thread.
+
+    `get_processes` returns the processes to sample by group name (ex:
+    "server", "browser"), a "total" group is added. `thresholds` maps
+    `<group>_rss_mb` or `<group>_cpu_percent` to a limit, `on_threshold(name,
+    value, sample)` is called when a value goes over its limit and again only
+    after it went back under.
+    """
+
+    shared_size = 64 * 1024
+
+    def __init__(
+        self,
+        get_processes: Callable[[], Dict[str, List["psutil.Process"]]],
+        interval: float = 1,
+        thresholds: Dict[str, float] = None,
+        on_threshold: Callable = None,
+    ):
+        import mmap
+        import multiprocessing
+
+        self.get_processes = get_processes
+        self.interval = interval
+        self.thresholds = thresholds or {}
+        self.on_threshold = on_threshold
+        self.current: Dict[str, Any] = {}
+        self.peak: Dict[str, float] = {}
+        self.exceeded = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        # cpu_percent is measured since the previous call on the same object
+        self.known: Dict[int, "psutil.Process"] = {}
+        # Samples are taken in this process, forked servers serving
+        # /resources read the last one from memory shared before the fork
+        self.pid = os.getpid()
+        self.shared = mmap.mmap(-1, self.shared_size)
+        self.shared_lock = multiprocessing.Lock()
+
+    def sample_group(self, processes: List["psutil.Process"]):
+        import psutil
+
+        rss = cpu = count = 0
+        for proc in processes:
+            proc = self.known.setdefault(proc.pid, proc)
+            try:
+                with proc.oneshot():
+                    rss += proc.memory_info().rss
+                    cpu += proc.cpu_percent()
+                count += 1
+            except psutil.Error:
+                self.known.pop(proc.pid, None)
+        return {
+            "rss_mb": round(rss / 1024 / 1024, 1),
+            "cpu_percent": round(cpu, 1),
+            "processes": count,
+        }
+
+    def sample(self):
+        groups = self.get_processes()
+        sample = {name: self.sample_group(procs) for name, procs in groups.items()}
+        sample["total"] = {
+            key: round(sum(group[key] for group in sample.values()), 1)
+            for key in ["rss_mb", "cpu_percent", "processes"]
+        }
+        sample["time"] = time.time()
+
+        values = {
+            f"{name}_{key}": group[key]
+            for name, group in sample.items()
+            if name != "time"
+            for key in ["rss_mb", "cpu_percent"]
+        }
+
+        with self.lock:
+            self.current = sample
+            for name, value in values.items():
+                self.peak[name] = max(self.peak.get(name, 0), value)
+        self.publish()
+
+        for name, limit in self.thresholds.items():
+            value = values.get(name)
+            if value is None:
+                continue
+            if value <= limit:
+                self.exceeded.discard(name)
+            elif name not in self.exceeded:
+                self.exceeded.add(name)
+                logger.warning(f"Resource threshold {name} exceeded: {value} > {limit}")
+                if self.on_threshold is not None:
+                    try:
+                        self.on_threshold(name, value, sample)
+                    except Exception:
+                        logger.exception("on_resource_threshold failed")
+
+        return sample
+
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Resource sampling failed")
+
+    def start(self):
+        self.sample()
+        self.thread = Thread(target=self.loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def publish(self):
+        import json
+
+        with self.lock:
+            data = json.dumps({"current": self.current, "peak": self.peak}).encode()
+        if len(data) + 4 > self.shared_size:
+            logger.warning(f"Resource sample too large to share: {len(data)} bytes")
+            return
+        with self.shared_lock:
+            self.shared[: len(data) + 4] = len(data).to_bytes(4, "little") + data
+
+    def to_dict(self):
+        if os.getpid() == self.pid:
+            with self.lock:
+                return {"current": self.current, "peak": dict(self.peak)}
+
+        import json
+
+        with self.shared_lock:
+            size = int.from_bytes(self.shared[:4], "little")
+            data = self.shared[4 : size + 4]
+        return json.loads(data) if size else {"current": {}, "peak": {}}
+
+
+FLASKWEBGUI_ROUTE_PREFIX = "/__flaskwebgui__"
+
+SPLASH_PAGE = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Loading...</title>
+<style>
+html, body { height: 100%; margin: 0; }
+body { display: flex; align-items: center; justify-content: center;
+       font-family: system-ui, sans-serif; color: #555; background: #fafafa; }
+@media (prefers-color-scheme: dark) { body { color: #bbb; background: #202124; } }
+.spinner { width: 28px; height: 28px; margin-right: 12px; border-radius: 50%;
+           border: 3px solid currentColor; border-right-color: transparent;
+           animation: spin 0.8s linear infinite; }
+@keyframes spin { to { transform: rotate(360deg); } }
+</style>
+</head>
+<body><div class="spinner"></div>Loading...</body>
+</html>"""
+
+# Opaque no-cors responses are enough to know the server answers
+SPLASH_SCRIPT = """<script>
+(function poll() {
+  fetch("%s", {mode: "no-cors", cache: "no-store"}).then(
+    function () { location.replace("%s"); },
+    function () { setTimeout(poll, 100); }
+  );
+})();
+</script>"""
+
+# The page stays on screen until the navigation gets its response
+SPLASH_REDIRECT_SCRIPT = """<script>
+setTimeout(function () { location.replace("%s"); }, 50);
+</script>"""
+
+
+def get_splash_url(url: str, ready_url: str = None, page: str = SPLASH_PAGE):
+    """data: url showing `page` until `ready_url` answers, then opening `url`.
+
+    Without `ready_url` `url` is opened right away, for servers whose
+    listening socket queues the request until they answer.
+    """
+    from urllib.parse import quote
+
+    if ready_url is None:
+        script = SPLASH_REDIRECT_SCRIPT % url
+    else:
+        script = SPLASH_SCRIPT % (ready_url, url)
+    if "</body>" in page:
+        page = page.replace("</body>", script + "</body>", 1)
+    else:
+        page += script
+    return "data:text/html;charset=utf-8," + quote(page)
+
+
+def http_status_line(status: int):
+    from http import HTTPStatus
+
+    return f"{status} {HTTPStatus(status).phrase}"
+
+
+class FlaskUIMiddleware:
+    """WSGI middleware FlaskUI installs on the default servers.
+
+    Answers the reserved FLASKWEBGUI_ROUTE_PREFIX routes, `routes` maps a
+    path to a function returning `(status, content_type, body)`, and calls
+    `on_first_request` for the first request which reaches the app.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        routes: Dict[str, Callable] = None,
+        on_first_request: Callable = None,
+        ignore_paths: List[str] = None,
+    ):
+        self.app = app
+        self.routes = {} if routes is None else routes
+        self.on_first_request = on_first_request
+        self.ignore_paths = ignore_paths or []
+
+    def get_route(self, path: str):
+        if path.startswith(FLASKWEBGUI_ROUTE_PREFIX):
+            return self.routes.get(path[len(FLASKWEBGUI_ROUTE_PREFIX) :])
+
+        if self.on_first_request is not None and path not in self.ignore_paths:
+            callback, self.on_first_request = self.on_first_request, None
+            callback()
+        return None
+
+    def __call__(self, environ, start_response):
+        route = self.get_route(environ.get("PATH_INFO", ""))
+        if route is None:
+            return self.app(environ, start_response)
+
+        status, content_type, body = route()
+        start_response(
+            http_status_line(status),
+            [("Content-Type", content_type), ("Content-Length", str(len(body)))],
+        )
+        return [body]
+
+
+class AsgiFlaskUIMiddleware(FlaskUIMiddleware):
+    async def __call__(self, scope, receive, send):
+        route = self.get_route(scope["path"]) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        status, content_type, body = route()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", content_type.encode()),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def wrap_app(
+    app: Any,
+    wsgi_middleware: Callable,
+    asgi_middleware: Callable,
+    interface: str = "wsgi",
+):
+    """Wrap `app` with the middleware matching its interface (wsgi/asgi).
+
+    Flask apps get their `wsgi_app` wrapped so the app object stays usable
+    by servers which need a real Flask instance (ex: flask_socketio).
+    """
+    if hasattr(app, "wsgi_app"):
+        app.wsgi_app = wsgi_middleware(app.wsgi_app)
+        return app
+    if interface == "asgi":
+        return asgi_middleware(app)
+    return wsgi_middleware(app)
+
+
+FINGERPRINT_PATTERN = r"[.-]([0-9a-f]{8,})\.[^.]+$"
+
+compressible_types = [
+    "text/",
+    "application/javascript",
+    "application/json",
+    "image/svg",
+]
+
+
+@dataclass
+class StaticAsset:
+    path: str
+    size: int
+    mtime: float
+    etag: str
+    content_type: str
+    cache_control: str
+    data: bytes = None
+    encodings: Dict[str, bytes] = field(default_factory=dict)
+
+
+class StaticIndex:
+    """In-memory index of static folders, `dirs` is a list of (url prefix, folder).
+
+    Files with a content hash in their name (ex: app.3f2a9c1e.js) are served
+    with `Cache-Control: immutable`, the others must be revalidated with
+    their ETag which is answered with a 304 from memory. Files are kept in
+    memory, gzip variants are made for compressible types and `.br`/`.gz`
+    files found next to the originals are used as well. Files larger than
+    `max_memory_size` and Range requests (media seeking) are left to the app,
+    which streams them.
+    """
+
+    def __init__(self, dirs: List[tuple], max_memory_size: int = 1024 * 1024):
+        self.max_memory_size = max_memory_size
+        self.assets: Dict[str, StaticAsset] = {}
+        self.prefixes = []
+
+        for url_prefix, directory in dirs:
+            url_prefix = "/" + url_prefix.strip("/")
+            self.prefixes.append(url_prefix.rstrip("/") + "/")
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if name.endswith((".gz", ".br")):
+                        continue
+                    path = os.path.join(root, name)
+                    url = os.path.relpath(path, directory).replace(os.sep, "/")
+                    asset = self.load(path)
+                    if asset is not None:
+                        self.assets[url_prefix.rstrip("/") + "/" + url] = asset
+
+        logger.info(f"Indexed {len(self.assets)} static files")
+
+    def load(self, path: str):
+        import re
+        import gzip
+        import hashlib
+        import mimetypes
+
+        try:
+            stat = os.stat(path)
+            if stat.st_size > self.max_memory_size:
+                return None
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+
+        # A hex group with a digit, words like "-deadbeef" are not hashes
+        fingerprint = re.search(FINGERPRINT_PATTERN, os.path.basename(path))
+        if fingerprint and any(char.isdigit() for char in fingerprint.group(1)):
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = "no-cache"
+
+        asset = StaticAsset(
+            path=path,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            etag='"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"',
+            content_type=content_type,
+            cache_control=cache_control,
+            data=content,
+        )
+
+        for encoding, extension in [("br", ".br"), ("gzip", ".gz")]:
+            try:
+                with open(path + extension, "rb") as f:
+                    asset.encodings[encoding] = f.read()
+            except OSError:
+                continue
+
+        compressible = any(content_type.startswith(t) for t in compressible_types)
+        if compressible and "gzip" not in asset.encodings and stat.st_size > 1024:
+            compressed = gzip.compress(content, mtime=0)
+            if len(compressed) < stat.st_size:
+                asset.encodings["gzip"] = compressed
+
+        return asset
+
+    def get(self, path: str):
+        if not path.startswith(tuple(self.prefixes)):
+            return None
+
+        asset = self.assets.get(path)
+        if asset is None:
+            return None
+
+        # Keep serving fresh files if they change while the app runs
+        try:
+            stat = os.stat(asset.path)
+        except OSError:
+            return None
+        if stat.st_mtime != asset.mtime or stat.st_size != asset.size:
+            asset = self.assets[path] = self.load(asset.path)
+
+        return asset
+
+    def respond(
+        self,
+        method: str,
+        path: str,
+        if_none_match: str,
+        accept_encoding: str,
+        byte_range: str = "",
+    ):
+        """Returns `(status, headers, body)` or None to let the app handle it."""
+        if method not in ("GET", "HEAD") or byte_range:
+            return None
+
+        asset = self.get(path)
+        if asset is None:
+            return None
+
+        headers = [
+            ("ETag", asset.etag),
+            ("Cache-Control", asset.cache_control),
+        ]
+        if asset.encodings:
+            headers.append(("Vary", "Accept-Encoding"))
+
+        if if_none_match and asset.etag in if_none_match:
+            return 304, headers, b""
+
+        body = asset.data
+        for encoding, content in asset.encodings.items():
+            if encoding in accept_encoding:
+                headers.append(("Content-Encoding", encoding))
+                body = content
+                break
+
+        headers.append(("Content-Type", asset.content_type))
+        headers.append(("Content-Length", str(len(body))))
+        return 200, headers, b"" if method == "HEAD" else body
+
+
+def find_static_dirs(app: Any):
+    """Static folders of Flask apps and StaticFiles mounts of FastAPI/Starlette apps."""
+    dirs = []
+
+    static_folder = getattr(app, "static_folder", None)
+    static_url_path = getattr(app, "static_url_path", None)
+    if static_folder and static_url_path is not None and os.path.isdir(static_folder):
+        dirs.append((static_url_path, static_folder))
+
+    for route in getattr(app, "routes", None) or []:
+        directory = getattr(getattr(route, "app", None), "directory", None)
+        if directory and os.path.isdir(directory):
+            dirs.append((route.path, str(directory)))
+
+    return dirs
+
+
+class StaticFilesMiddleware:
+    def __init__(self, app: Callable, index: StaticIndex):
+        self.app = app
+        self.index = index
+
+    def __call__(self, environ, start_response):
+        response = self.index.respond(
+            environ["REQUEST_METHOD"],
+            environ.get("PATH_INFO", ""),
+            environ.get("HTTP_IF_NONE_MATCH", ""),
+            environ.get("HTTP_ACCEPT_ENCODING", ""),
+            environ.get("HTTP_RANGE", ""),
+        )
+        if response is None:
+            return self.app(environ, start_response)
+
+        status, headers, body = response
+        start_response(http_status_line(status), headers)
+        return [body]
+
+
+class AsgiStaticFilesMiddleware(StaticFilesMiddleware):
+    async def __call__(self, scope, receive, send):
+        response = None
+        if scope["type"] == "http":
+            headers = dict(scope["headers"])
+            response = self.index.respond(
+                scope["method"],
+                scope["path"],
+                headers.get(b"if-none-match", b"").decode(),
+                headers.get(b"accept-encoding", b"").decode(),
+                headers.get(b"range", b"").decode(),
+            )
+
+        if response is None:
+            await self.app(scope, receive, send)
+            return
+
+        status, headers, body = response
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+latency_buckets = [
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+]
+
+ID_SEGMENT_PATTERN = r"/(\d+|[0-9a-fA-F-]{16,})(?=/|$)"
+
+
+class RouteMetrics:
+    """Request counts and latency histograms per route, and requests in flight.
+
+    Memory is bounded: each route has a fixed list of bucket counters
+    (`buckets` are upper bounds in seconds, plus one for slower requests)
+    and after `max_routes` routes new ones are counted under "other".
+    Percentiles are estimated with the upper bound of their bucket.
+
+    Counters live in memory shared with the processes forked after it is
+    created (server workers), so every process records into and reads the
+    same totals. Route names are truncated to `name_size` bytes.
+    """
+
+    # in_flight, max_in_flight, routes, generation, started_at
+    header_size = 5
+    name_size = 254
+
+    def __init__(self, buckets: List[float] = None, max_routes: int = 100):
+        import mmap
+        import multiprocessing
+
+        self.buckets = sorted(buckets or latency_buckets)
+        self.max_routes = max_routes
+        # count, errors, total, max and the buckets of each route
+        self.slot_size = 4 + len(self.buckets) + 1
+        # One more slot so "other" always has one
+        self.capacity = max_routes + 1
+        values_size = (self.header_size + self.capacity * self.slot_size) * 8
+        self.shared = mmap.mmap(-1, values_size + self.capacity * (self.name_size + 2))
+        self.values = memoryview(self.shared)[:values_size].cast("d")
+        self.names = memoryview(self.shared)[values_size:]
+        self.values[4] = time.time()
+        self.lock = multiprocessing.Lock()
+        # Slots of the routes this process has seen, until the next reset
+        self.slots: Dict[str, int] = {}
+        self.generation = 0
+
+    def start(self):
+        values = self.values
+        with self.lock:
+            values[0] += 1
+            if values[0] > values[1]:
+                values[1] = values[0]
+
+    def get_name(self, slot: int):
+        offset = slot * (self.name_size + 2)
+        size = int.from_bytes(self.names[offset : offset + 2], "little")
+        return bytes(self.names[offset + 2 : offset + 2 + size]).decode(
+            errors="replace"
+        )
+
+    def find_slot(self, route: str):
+        """Slot of `route`, added if needed, called with the lock held."""
+        values = self.values
+        if values[3] != self.generation:
+            self.slots.clear()
+            self.generation = values[3]
+
+        # Routes added by the other processes since we last looked
+        count = int(values[2])
+        for slot in range(len(self.slots), count):
+            self.slots[self.get_name(slot)] = slot
+
+        name = route.encode()[: self.name_size].decode(errors="ignore")
+        slot = self.slots.get(name)
+        if slot is not None:
+            return slot
+        if count >= self.max_routes and name != "other":
+            return self.find_slot("other")
+
+        data = name.encode()
+        offset = count * (self.name_size + 2)
+        self.names[offset : offset + 2 + len(data)] = (
+            len(data).to_bytes(2, "little") + data
+        )
+        values[2] = count + 1
+        self.slots[name] = count
+        return count
+
+    def record(self, route: str, seconds: float, error: bool = False):
+        bucket = bisect_left(self.buckets, seconds)
+        values = self.values
+        with self.lock:
+            values[0] -= 1
+            slot = self.slots.get(route) if values[3] == self.generation else None
+            if slot is None:
+                slot = self.find_slot(route)
+            offset = self.header_size + slot * self.slot_size
+            values[offset] += 1
+            values[offset + 1] += error
+            values[offset + 2] += seconds
+            if seconds > values[offset + 3]:
+                values[offset + 3] = seconds
+            values[offset + 4 + bucket] += 1
+
+    def percentile(
+        self, count: int, maximum: float, buckets: List[int], fraction: float
+    ):
+        rank = fraction * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, maximum)
+        return maximum
+
+    def to_dict(self):
+        values = self.values
+        with self.lock:
+            header = values[: self.header_size].tolist()
+            slots = [
+                (
+                    self.get_name(slot),
+                    values[offset : offset + self.slot_size].tolist(),
+                )
+                for slot in range(int(header[2]))
+                for offset in [self.header_size + slot * self.slot_size]
+            ]
+
+        bounds = [str(b) for b in self.buckets] + ["inf"]
+        routes = {}
+        for route, (count, errors, total, maximum, *buckets) in slots:
+            if not count:
+                continue
+            buckets = [int(b) for b in buckets]
+            routes[route] = {
+                "count": int(count),
+                "errors": int(errors),
+                "mean": round(total / count, 6),
+                "max": round(maximum, 6),
+                "p50": round(self.percentile(count, maximum, buckets, 0.5), 6),
+                "p90": round(self.percentile(count, maximum, buckets, 0.9), 6),
+                "p99": round(self.percentile(count, maximum, buckets, 0.99), 6),
+                "buckets": dict(zip(bounds, buckets)),
+            }
+        return {
+            "since": header[4],
+            "in_flight": int(header[0]),
+            "max_in_flight": int(header[1]),
+            "routes": routes,
+        }
+
+    def reset(self):
+        values = self.values
+        with self.lock:
+            # Counters and names of all routes
+            start = self.header_size * 8
+            self.shared[start:] = bytes(len(self.shared) - start)
+            values[1] = values[0]
+            values[2] = 0
+            values[3] += 1
+            values[4] = time.time()
+
+
+@lru_cache(maxsize=1024)
+def get_path_route(method: str, path: str, status: int):
+    """Route name from the path when the framework doesn't tell which route matched."""
+    import re
+
+    if status == 404:
+        # Don't make a route of every url scanned or mistyped
+        return f"{method} <unmatched>"
+    return f"{method} {re.sub(ID_SEGMENT_PATTERN, '/{id}', path)}"
+
+
+def track_flask_routes(app: Any):
+    """Keep the url rule Flask matched in the environ, Flask clears its request."""
+
+    def keep_url_rule():
+        from flask import request
+
+        rule = request.url_rule
+        request.environ["flaskwebgui.route"] = rule.rule if rule else "<unmatched>"
+
+    # First, before any hook which may answer the request itself
+    app.before_request_funcs.setdefault(None, []).insert(0, keep_url_rule)
+
+
+def get_wsgi_route(environ: dict, status: int):
+    route = environ.get("flaskwebgui.route")
+    if route is not None:
+        return f"{environ['REQUEST_METHOD']} {route}"
+    return get_path_route(
+        environ["REQUEST_METHOD"], environ.get("PATH_INFO", ""), status
+    )
+
+
+class MeasuredResponse:
+    """WSGI response iterable which records the request when the server closes it."""
+
+    __slots__ = ("metrics", "environ", "start_response", "started", "status", "body")
+
+    def __init__(self, metrics: RouteMetrics, environ: dict, start_response: Callable):
+        self.metrics = metrics
+        self.environ = environ
+        self.start_response = start_response
+        self.started = time.perf_counter()
+        self.status = 0
+        self.body = ()
+
+    def capture_status(self, status: str, headers: list, exc_info: Any = None):
+        self.status = int(status[:3])
+        return self.start_response(status, headers, exc_info)
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            close = getattr(self.body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self.metrics.record(
+                get_wsgi_route(self.environ, self.status),
+                time.perf_counter() - self.started,
+                self.status >= 500,
+            )
+
+
+class RouteMetricsMiddleware:
+    def __init__(self, app: Callable, metrics: RouteMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        self.metrics.start()
+        response = MeasuredResponse(self.metrics, environ, start_response)
+        try:
+            response.body = self.app(environ, response.capture_status)
+        except BaseException:
+            response.status = 500
+            response.close()
+            raise
+        return response
+
+
+class AsgiRouteMetricsMiddleware(RouteMetricsMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def capture_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, capture_status)
+        finally:
+            # Starlette (FastAPI) puts the matched route in the scope
+            route = scope.get("route")
+            if route is not None and hasattr(route, "path"):
+                route = f"{scope['method']} {route.path}"
+            else:
+                route = get_path_route(scope["method"], scope["path"], status)
+            self.metrics.record(route, time.perf_counter() - started, status >= 500)
+
+
+def init_pool_worker(preload: List[Union[str, Callable]], barrier: Any = None):
+    import signal
+    import importlib
+
+    global FLASKWEBGUI_POOL_WORKER, FLASKWEBGUI_POOL_BARRIER
+    FLASKWEBGUI_POOL_WORKER = True
+    FLASKWEBGUI_POOL_BARRIER = barrier
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for item in preload:
+        if isinstance(item, str):
+            importlib.import_module(item)
+        else:
+            item()
+
+
+def wait_pool_workers():
+    # Holds this worker until all the others are initialized as well
+    FLASKWEBGUI_POOL_BARRIER.wait()
+
+
+def start_process_pool(size: int, preload: List[Union[str, Callable]] = None):
+    """Process pool with `preload` (module names or functions) done in each worker.
+
+    All the workers are started right away and warm up in the background,
+    the first offloaded calls wait behind the warm up instead of paying the
+    preload cost one worker at a time.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    context = multiprocessing.get_context("spawn")
+    # Only released once `size` initialized workers are each holding one task
+    barrier = context.Barrier(size)
+    pool = ProcessPoolExecutor(
+        max_workers=size,
+        mp_context=context,
+        initializer=init_pool_worker,
+        initargs=(preload or [], barrier),
+    )
+    for _ in range(size):
+        pool.submit(wait_pool_workers)
+    return pool
+
+
+def serve_with_process_pool(
+    server: Callable, size: int, preload: List[Union[str, Callable]], /, **kwargs
+):
+    """Forked server process starting its own process pool.
+
+    A pool started before the fork is unusable in the forked process, its
+    management thread is not copied.
+    """
+    global FLASKWEBGUI_PROCESS_POOL
+    FLASKWEBGUI_PROCESS_POOL = start_process_pool(size, preload)
+    try:
+        server(**kwargs)
+    finally:
+        FLASKWEBGUI_PROCESS_POOL.shutdown(wait=True, cancel_futures=True)
+
+
+def run_in_process_pool(func: Callable, *args, **kwargs):
+    """Run `func` in the FlaskUI process pool, returns a `concurrent.futures.Future`.
+
+    Without a pool (or inside a pool worker) `func` runs right away in the
+    calling thread. In async handlers use `await asyncio.wrap_future(...)`.
+    """
+    from concurrent.futures import Future
+
+    if FLASKWEBGUI_PROCESS_POOL is not None and not FLASKWEBGUI_POOL_WORKER:
+        return FLASKWEBGUI_PROCESS_POOL.submit(func, *args, **kwargs)
+
+    future = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except BaseException as ex:
+        future.set_exception(ex)
+    return future
+
+
+def offload(func: Callable):
+    """Decorator which runs `func` in the FlaskUI process pool and waits the result.
+
+    `func` must be defined at module level, arguments and result must be picklable.
+    """
+    import functools
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # In the pool worker `wrapper` is what gets unpickled, run the real func
+        if FLASKWEBGUI_PROCESS_POOL is None or FLASKWEBGUI_POOL_WORKER:
+            return func(*args, **kwargs)
+        return FLASKWEBGUI_PROCESS_POOL.submit(wrapper, *args, **kwargs).result()
+
+    return wrapper
+
+
+def serve_worker(target: Callable, kwargs: dict):
+    import signal
+
+    # Ctrl+C reaches the whole process group, the parent does the shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(**kwargs)
+
+
+class ServerWorkers:
+    """`workers` forked processes serving the same pre-bound listening socket.
+
+    Quacks like a `Process` so FlaskUI can start, join and stop it.
+    """
+
+    def __init__(self, target: Callable, kwargs: dict, workers: int):
+        import multiprocessing
+
+        self.context = multiprocessing.get_context("fork")
+        self.target = target
+        self.kwargs = kwargs
+        self.processes = [self.create_worker() for _ in range(workers)]
+
+    def create_worker(self):
+        return self.context.Process(
+            target=serve_worker, args=(self.target, self.kwargs)
+        )
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+
+    def join(self, timeout: float = None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for process in self.processes:
+            if deadline is None:
+                process.join()
+            else:
+                process.join(max(deadline - time.perf_counter(), 0))
+
+    def is_alive(self):
+        return any(process.is_alive() for process in self.processes)
+
+    def wait_any(self):
+        from multiprocessing.connection import wait
+
+        wait([process.sentinel for process in self.processes])
+
+    def restart_dead(self):
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                process.join()
+                self.processes[index] = self.create_worker()
+                self.processes[index].start()
+
+    def terminate(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+
+    def kill(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.kill()
+
+
+class FileWatcher:
+    """Calls `on_change(paths)` when files matching `patterns` change in `directories`.
+
+    Uses inotify on Linux and polls modification times elsewhere (or when
+    inotify is not usable, ex: too many watches).
+    """
+
+    ignore_dirs = ["__pycache__", "node_modules", "venv", "env", "site-packages"]
+
+    def __init__(
+        self,
+        directories: List[str],
+        on_change: Callable[[List[str]], None],
+        patterns: List[str] = None,
+        interval: float = 0.5,
+        debounce: float = 0.05,
+    ):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.on_change = on_change
+        self.patterns = patterns or ["*.py", "*.html", "*.jinja", "*.jinja2"]
+        self.interval = interval
+        self.debounce = debounce
+        self.stopped = threading.Event()
+
+    def matches(self, path: str):
+        import fnmatch
+
+        name = os.path.basename(path)
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns)
+
+    def walk(self, directories: List[str] = None):
+        for directory in directories or self.directories:
+            for dirpath, dirnames, filenames in os.walk(directory):
+                dirnames[:] = [
+                    name
+                    for name in dirnames
+                    if name not in self.ignore_dirs and not name.startswith(".")
+                ]
+                yield dirpath, filenames
+
+    def snapshot(self):
+        mtimes = {}
+        for dirpath, filenames in self.walk():
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if self.matches(path):
+                    try:
+                        mtimes[path] = os.stat(path).st_mtime_ns
+                    except OSError:
+                        continue
+        return mtimes
+
+    def watch_polling(self):
+        previous = self.snapshot()
+        while not self.stopped.wait(self.interval):
+            current = self.snapshot()
+            changed = [
+                path
+                for path in current.keys() | previous.keys()
+                if current.get(path) != previous.get(path)
+            ]
+            previous = current
+            if changed:
+                self.on_change(sorted(changed))
+
+    def watch_inotify(self):
+        import ctypes
+        import ctypes.util
+        import select
+        import struct
+
+        IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x8, 0x40, 0x80
+        IN_CREATE, IN_DELETE, IN_ISDIR = 0x100, 0x200, 0x40000000
+        mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        watches = {}
+
+        def add_watches(directories: List[str]):
+            for dirpath, _ in self.walk(directories):
+                wd = libc.inotify_add_watch(fd, os.fsencode(dirpath), mask)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"Can't watch {dirpath}")
+                watches[wd] = dirpath
+
+        try:
+            add_watches(self.directories)
+            while not self.stopped.is_set():
+                if not select.select([fd], [], [], 0.5)[0]:
+                    continue
+                # Editors save in several steps, take them all at once
+                time.sleep(self.debounce)
+
+                data = b""
+                while True:
+                    try:
+                        data += os.read(fd, 65536)
+                    except BlockingIOError:
+                        break
+
+                changed = set()
+                offset = 0
+                while offset < len(data):
+                    wd, event, _, length = struct.unpack_from("iIII", data, offset)
+                    name = data[offset + 16 : offset + 16 + length].rstrip(b"\0")
+                    offset += 16 + length
+                    path = os.path.join(watches.get(wd, ""), os.fsdecode(name))
+                    if event & IN_ISDIR:
+                        if event & (IN_CREATE | IN_MOVED_TO) and os.path.isdir(path):
+                            add_watches([path])
+                    elif self.matches(path):
+                        changed.add(path)
+
+                if changed:
+                    self.on_change(sorted(changed))
+        finally:
+            os.close(fd)
+
+    def run(self):
+        if OPERATING_SYSTEM == "linux":
+            try:
+                self.watch_inotify()
+                return
+            except OSError as ex:
+                logger.warning(f"Can't use inotify ({ex}), polling files instead")
+        self.watch_polling()
+
+    def start(self):
+        thread = Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class ReloadServer:
+    """Server in a child process started again with fresh code when files change.
+
+    Quacks like a `Process`. Each child gets the same pre-bound listening
+    socket, so the browser keeps its url and profile. `on_reload(started,
+    paths)` is called after each restart.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        sock: Any,
+        directories: List[str],
+        on_reload: Callable[[float, List[str]], None],
+        patterns: List[str] = None,
+        shutdown_timeout: float = 5,
+    ):
+        self.config = config
+        self.socket = sock
+        self.on_reload = on_reload
+        self.shutdown_timeout = shutdown_timeout
+        self.watcher = FileWatcher(directories, self.reload, patterns)
+        self.child = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def start_child(self):
+        import json
+        import subprocess
+
+        source_dir = os.path.dirname(os.path.abspath(__file__))
+        command = [
+            sys.executable,
+            "-c",
+            f"import sys; sys.path.insert(0, {source_dir!r}); "
+            "import flaskwebgui; flaskwebgui.serve_reload_child()",
+        ]
+
+        if OPERATING_SYSTEM == "windows":
+            env = {**os.environ, "FLASKWEBGUI_RELOAD": json.dumps(self.config)}
+            self.child = subprocess.Popen(command, env=env, stdin=subprocess.PIPE)
+            self.child.stdin.write(self.socket.share(self.child.pid))
+            self.child.stdin.close()
+            return
+
+        config = {**self.config, "fd": self.socket.fileno()}
+        env = {**os.environ, "FLASKWEBGUI_RELOAD": json.dumps(config)}
+        self.child = subprocess.Popen(command, env=env, pass_fds=[self.socket.fileno()])
+
+    def stop_child(self):
+        import subprocess
+
+        if self.child is None or self.child.poll() is not None:
+            return
+        self.child.terminate()
+        try:
+            self.child.wait(self.shutdown_timeout + 1)
+        except subprocess.TimeoutExpired:
+            self.child.kill()
+            self.child.wait()
+
+    def reload(self, paths: List[str]):
+        started = time.perf_counter()
+        with self.lock:
+            if self.stopped.is_set():
+                return
+            names = ", ".join(os.path.basename(path) for path in paths[:3])
+            logger.info(f"Changed {names}{'...' if len(paths) > 3 else ''}, reloading")
+            self.stop_child()
+            self.start_child()
+        self.on_reload(started, paths)
+
+    def start(self):
+        self.start_child()
+        self.watcher.start()
+
+    def join(self, timeout: float = None):
+        self.stopped.wait(timeout)
+
+    def is_alive(self):
+        return not self.stopped.is_set()
+
+    def terminate(self):
+        self.watcher.stop()
+        with self.lock:
+            self.stop_child()
+            self.stopped.set()
+
+    def kill(self):
+        self.watcher.stop()
+        with self.lock:
+            if self.child is not None and self.child.poll() is None:
+                self.child.kill()
+            self.stopped.set()
+
+
+def serve_reload_child():
+    """Entry point of the server process started by `reload=True`."""
+    import json
+    import signal
+    import socket
+
+    global FLASKWEBGUI_RELOAD_CHILD
+    FLASKWEBGUI_RELOAD_CHILD = True
+    # Ctrl+C reaches the whole process group, the parent does the shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_logging()
+
+    config = json.loads(os.environ.pop("FLASKWEBGUI_RELOAD"))
+    if "fd" in config:
+        sock = socket.socket(fileno=config["fd"])
+    else:
+        sock = socket.fromshare(sys.stdin.buffer.read())
+
+    if "path" in config:
+        import runpy
+
+        # The app object was defined in the main script
+        sys.path.insert(0, os.path.dirname(config["path"]))
+        script = runpy.run_path(config["path"], run_name="__flaskwebgui_reload__")
+        app = import_app(script[config["attr"]], config["factory"])
+    else:
+        sys.path.insert(0, os.getcwd())
+        app = import_app(config["app"], config["factory"])
+
+    default_server = webserver_dispacher[config["server"]]
+    routes = {"/ready": lambda: (204, "text/plain", b"")}
+    app = wrap_app(
+        app,
+        lambda app: FlaskUIMiddleware(app, routes),
+        lambda app: AsgiFlaskUIMiddleware(app, routes),
+        default_server.interface,
+    )
+
+    server_kwargs = default_server.get_server_kwargs(
+        app=app, port=sock.getsockname()[1], threads=config["threads"]
+    )
+    server_kwargs["sock"] = sock
+    server_kwargs["shutdown_timeout"] = config["shutdown_timeout"]
+    default_server.server(**server_kwargs)
+
+
+def register_server_stop(stop: Callable[[], None]):
+    """Called by the default servers with a function making them drain and exit."""
+    global FLASKWEBGUI_SERVER_STOP
+    FLASKWEBGUI_SERVER_STOP = stop
+
+    # Server processes (workers, macOS) are stopped with SIGTERM
+    if threading.current_thread() is threading.main_thread():
+        import signal
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+
+
+def drain_waitress(server: Any, timeout: float):
+    from waitress.channel import HTTPChannel
+
+    # The drain needs waitress internals (the dispatcher map, the trigger,
+    # channel buffers), when they are missing stop without waiting
+    try:
+        connections = server._map
+        trigger = server.trigger
+    except AttributeError:
+        logger.debug("Unknown waitress server, closing without draining")
+        server.close()
+        return
+
+    def stop_accepting():
+        for dispatcher in list(connections.values()):
+            if getattr(dispatcher, "accepting", False):
+                dispatcher.accepting = False
+
+    def close_all():
+        for dispatcher in list(connections.values()):
+            if dispatcher is not server and dispatcher is not trigger:
+                dispatcher.close()
+        # Also closes the trigger, the server loop ends with nothing to watch
+        server.close()
+
+    # Dispatchers belong to the server loop thread, triggers run code there
+    trigger.pull_trigger(stop_accepting)
+
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            busy = [
+                channel
+                for channel in list(connections.values())
+                if isinstance(channel, HTTPChannel)
+                and (channel.requests or channel.total_outbufs_len)
+            ]
+        except AttributeError:
+            logger.debug("Unknown waitress channel, closing without draining")
+            break
+        if not busy:
+            break
+        if time.perf_counter() > deadline:
+            logger.warning(f"{len(busy)} requests still running after {timeout}s")
+            break
+        time.sleep(0.01)
+
+    trigger.pull_trigger(close_all)
 
-windows_browser_paths = [
-    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-    r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
-    r"C:\Program Files\Microsoft\Edge\Application\msedge.exe",
-    r"C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe",
-]
 
+def serve_waitress(app: Any, sock: Any = None, shutdown_timeout: float = 5, **kwargs):
+    import logging
+    import waitress
 
-def get_free_port():
-    with socketserver.TCPServer(("localhost", 0), None) as s:
-        free_port = s.server_address[1]
-    return free_port
+    if sock is not None:
+        kwargs.pop("host", None)
+        kwargs.pop("port", None)
+        kwargs["sockets"] = [sock]
+
+    # Same as waitress.serve, keeping the server to stop it
+    logging.basicConfig()
+    server = waitress.create_server(app, **kwargs)
+    server.print_listen("Serving on http://{}:{}")
+
+    def stop():
+        drainer = Thread(target=drain_waitress, args=(server, shutdown_timeout))
+        drainer.daemon = True
+        drainer.start()
 
+    register_server_stop(stop)
+    server.run()
 
-def kill_port(port: int):
-    for proc in psutil.process_iter():
+
+class ActiveRequests:
+    """WSGI wrapper counting the requests whose response is not sent yet."""
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self.count = 0
+        self.idle = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        from werkzeug.wsgi import ClosingIterator
+
+        with self.idle:
+            self.count += 1
         try:
-            for conns in proc.net_connections(kind="inet"):
-                if conns.laddr.port == port:
-                    proc.send_signal(signal.SIGTERM)
-        except psutil.AccessDenied:
-            continue
+            return ClosingIterator(self.app(environ, start_response), self.done)
+        except BaseException:
+            self.done()
+            raise
 
+    def done(self):
+        with self.idle:
+            self.count -= 1
+            self.idle.notify_all()
 
-def close_application():
-    if FLASKWEBGUI_BROWSER_PROCESS is not None:
-        FLASKWEBGUI_BROWSER_PROCESS.terminate()
+    def wait_idle(self, timeout: float):
+        with self.idle:
+            return self.idle.wait_for(lambda: self.count <= 0, timeout)
 
-    kill_port(FLASKWEBGUI_USED_PORT)
 
+def serve_werkzeug(app: Any, sock: Any, shutdown_timeout: float = 5):
+    from werkzeug.serving import make_server
 
-def find_browser_in_paths(browser_paths: List[str]):
-    for path in browser_paths:
-        if os.path.exists(path):
-            return path
+    app = ActiveRequests(app)
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
 
+    def stop():
+        # shutdown() waits for serve_forever, which may run in this thread
+        stopper = Thread(target=server.shutdown)
+        stopper.daemon = True
+        stopper.start()
 
-browser_path_dispacher: Dict[str, Callable[[], str]] = {
-    "windows": lambda: find_browser_in_paths(windows_browser_paths),
-    "linux": lambda: find_browser_in_paths(linux_browser_paths),
-    "darwin": lambda: find_browser_in_paths(mac_browser_paths),
-}
+    register_server_stop(stop)
+    server.serve_forever()
+
+    if not app.wait_idle(shutdown_timeout):
+        logger.warning(f"{app.count} requests still running after {shutdown_timeout}s")
 
 
 class BaseDefaultServer:
     server: Callable
     get_server_kwargs: Callable
+    interface: str
+    accepts_socket: bool
 
 
 class DefaultServerFastApi:
+    interface = "asgi"
+    accepts_socket = True
+
     @staticmethod
     def get_server_kwargs(**kwargs):
-        server_kwargs = {"app": kwargs.get("app"), "port": kwargs.get("port")}
+        server_kwargs = {
+            "app": kwargs.get("app"),
+            "port": kwargs.get("port"),
+            "sock": kwargs.get("sock"),
+        }
         return server_kwargs
 
     @staticmethod
     def server(**server_kwargs):
         import uvicorn
 
-        uvicorn.run(**server_kwargs)
+        sock = server_kwargs.pop("sock", None)
+        server_kwargs.pop("threads", None)
+        shutdown_timeout = server_kwargs.pop("shutdown_timeout", 5)
+
+        try:
+            config = uvicorn.Config(
+                timeout_graceful_shutdown=shutdown_timeout, **server_kwargs
+            )
+        except TypeError:
+            # uvicorn < 0.24 waits for all requests
+            config = uvicorn.Config(**server_kwargs)
+        server = uvicorn.Server(config)
+
+        # uvicorn stops accepting, finishes running requests and exits
+        register_server_stop(lambda: setattr(server, "should_exit", True))
+        server.run(sockets=None if sock is None else [sock])
 
 
 class DefaultServerFlask:
+    interface = "wsgi"
+    accepts_socket = True
+
     @staticmethod
     def get_server_kwargs(**kwargs):
-        return {"app": kwargs.get("app"), "port": kwargs.get("port")}
+        server_kwargs = {
+            "app": kwargs.get("app"),
+            "port": kwargs.get("port"),
+            "sock": kwargs.get("sock"),
+        }
+        if kwargs.get("threads"):
+            server_kwargs["threads"] = kwargs["threads"]
+        return server_kwargs
 
     @staticmethod
     def server(**server_kwargs):
         app = server_kwargs.pop("app", None)
         server_kwargs.pop("debug", None)
+        sock = server_kwargs.pop("sock", None)
+        shutdown_timeout = server_kwargs.pop("shutdown_timeout", 5)
 
         try:
-            import waitress
-
-            waitress.serve(app, **server_kwargs)
+            serve_waitress(app, sock, shutdown_timeout, **server_kwargs)
         except:
-            app.run(**server_kwargs)
+            server_kwargs.pop("threads", None)
+            if sock is None:
+                app.run(**server_kwargs)
+            else:
+                serve_werkzeug(app, sock, shutdown_timeout)
 
 
 class DefaultServerDjango:
+    interface = "wsgi"
+    accepts_socket = True
+
     @staticmethod
     def get_server_kwargs(**kwargs):
-        return {"app": kwargs["app"], "port": kwargs["port"]}
+        return {
+            "app": kwargs["app"],
+            "port": kwargs["port"],
+            "sock": kwargs.get("sock"),
+            "threads": kwargs.get("threads") or 100,
+        }
 
     @staticmethod
     def server(**server_kwargs):
-        import waitress
         from whitenoise import WhiteNoise
 
-        application = WhiteNoise(server_kwargs["app"])
-        server_kwargs.pop("app")
+        application = WhiteNoise(server_kwargs.pop("app"))
+        sock = server_kwargs.pop("sock", None)
+        shutdown_timeout = server_kwargs.pop("shutdown_timeout", 5)
 
-        waitress.serve(application, threads=100, **server_kwargs)
+        server_kwargs.setdefault("threads", 100)
+        serve_waitress(application, sock, shutdown_timeout, **server_kwargs)
 
 
 class DefaultServerFlaskSocketIO:
+    interface = "wsgi"
+    # flask_socketio binds the port itself
+    accepts_socket = False
+
     @staticmethod
     def get_server_kwargs(**kwargs):
         return {
@@ -185,6 +2976,21 @@ webserver_dispacher: Dict[str, BaseDefaultServer] = {
 }
 
 
+def import_app(app: Union[str, Callable], factory: bool = False):
+    """Import a `"module:attr"` app (like uvicorn) and/or call an app factory."""
+    import importlib
+
+    if isinstance(app, str):
+        module_name, _, attrs = app.partition(":")
+        if not module_name or not attrs:
+            raise ValueError(f'Import string "{app}" must be in format "module:attr"')
+        app = importlib.import_module(module_name)
+        for attr in attrs.split("."):
+            app = getattr(app, attr)
+
+    return app() if factory else app
+
+
 @dataclass
 class FlaskUI:
     server: Union[str, Callable[[Any], None]]
@@ -204,39 +3010,380 @@ class FlaskUI:
     app_mode: bool = True
     browser_pid: int = None
     auto_close: bool = True
+    startup_timeout: float = 30
+    health_route: str = None
+    server_ready_seconds: float = None
+    persistent_profile: bool = False
+    profile_cache_max_mb: int = 256
+    profile_template: Union[bool, str] = None
+    profile_clone_seconds: float = None
+    cleanup_stale_profiles: bool = True
+    on_timeline: Callable = None
+    timeline_path: str = None
+    remote_debugging: bool = False
+    threads: int = None
+    workers: int = 1
+    process_pool_size: int = None
+    process_pool_preload: List[Union[str, Callable]] = None
+    cache_static: bool = False
+    static_dirs: List[tuple] = None
+    browser_preset: str = "default"
+    monitor_interval: float = None
+    resource_thresholds: Dict[str, float] = None
+    on_resource_threshold: Callable = None
+    splash: Union[bool, str] = None
+    app_factory: bool = False
+    single_instance: bool = False
+    shutdown_timeout: float = 5
+    restart_server: bool = False
+    max_server_restarts: int = 10
+    server_restarts: int = 0
+    server_downtime: float = 0
+    reload: bool = False
+    reload_dirs: List[str] = None
+    reload_includes: List[str] = None
+    page_metrics: bool = False
+    route_metrics: bool = False
 
     def __post_init__(self):
-        self.__keyboard_interrupt = False
+        configure_logging()
+        self.timeline = Timeline()
+        self.lifecycle = Lifecycle()
+        self.windows: List[Window] = []
+        self.pid = os.getpid()
+        self.server_events = None
+        self.devtools = None
+        self.page_monitor = None
         global FLASKWEBGUI_USED_PORT
 
-        if self.port is None:
-            self.port = (
-                self.server_kwargs.get("port")
-                if self.server_kwargs
-                else get_free_port()
+        # Metrics are read and windows reloaded after a server restart or
+        # a code reload through the DevTools endpoint
+        if self.page_metrics or self.restart_server or self.reload:
+            self.remote_debugging = True
+
+        if self.browser_preset not in browser_flag_presets:
+            raise ValueError(
+                f"Unknown browser_preset {self.browser_preset!r}, use one of: {', '.join(browser_flag_presets)}"
+            )
+
+        self.instance = None
+        self.skip_run = False
+        if FLASKWEBGUI_RELOAD_CHILD:
+            # The reload server process runs the main script again to find the app
+            logger.warning(
+                'FlaskUI.run() is skipped in the reload server, use `if __name__ == "__main__":`'
             )
+            self.skip_run = True
+            return
+        if self.single_instance and not self.claim_instance():
+            # Another launch of this app is running and opened a window for us
+            self.skip_run = True
+            return
+
+        self.__default_server = isinstance(self.server, str)
+        default_server = (
+            webserver_dispacher[self.server] if self.__default_server else None
+        )
+
+        self.reload_config = None
+        if self.reload:
+            self.reload_config = self.get_reload_config()
+            if self.reload_config is None:
+                self.reload = False
+
+        # Import the app while the port, profile and browser are set up
+        self.app_loader = None
+        self.app_error = None
+        if (isinstance(self.app, str) or self.app_factory) and not self.reload:
+            self.app_loader = Thread(target=self.load_app)
+            self.app_loader.daemon = True
+            self.app_loader.start()
+
+        with self.timeline.measure("port_selection"):
+            if self.port is None and self.server_kwargs:
+                self.port = self.server_kwargs.get("port")
+
+            self.socket = None
+            if default_server is not None and default_server.accepts_socket:
+                self.socket = create_listening_socket(self.port or 0)
+                self.port = self.socket.getsockname()[1]
+            elif self.port is None and not self.server_kwargs:
+                self.port = get_free_port()
 
         FLASKWEBGUI_USED_PORT = self.port
 
-        if isinstance(self.server, str):
-            default_server = webserver_dispacher[self.server]
+        self.routes = {"/ready": lambda: (204, "text/plain", b"")}
+
+        self.metrics = None
+        if self.route_metrics:
+            self.metrics = RouteMetrics()
+            self.routes["/metrics"] = self.metrics_route
+
+        self.monitor = None
+        if self.monitor_interval:
+            self.monitor = ResourceMonitor(
+                self.get_processes,
+                self.monitor_interval,
+                self.resource_thresholds,
+                self.on_resource_threshold,
+            )
+            self.routes["/resources"] = self.resources_route
+
+        if default_server is not None:
             self.server = default_server.server
+            self.__interface = default_server.interface
             self.server_kwargs = self.server_kwargs or default_server.get_server_kwargs(
-                app=self.app, port=self.port, flask_socketio=self.socketio
+                app=None if self.app_loader or self.reload else self.app,
+                port=self.port,
+                flask_socketio=self.socketio,
+                threads=self.threads,
             )
+            if self.socket is not None:
+                self.server_kwargs["sock"] = self.socket
+            self.server_kwargs["shutdown_timeout"] = self.shutdown_timeout
+            if self.server_kwargs.get("app") is not None:
+                self.server_kwargs["app"] = self.wrap_app(
+                    self.server_kwargs["app"], default_server.interface
+                )
 
-        self.profile_dir = os.path.join(
-            tempfile.gettempdir(), self.profile_dir_prefix + uuid.uuid4().hex
-        )
+        with self.timeline.measure("profile_setup"):
+            self.profile_dir = self.get_profile_dir()
         self.url = f"http://127.0.0.1:{self.port}"
 
-        self.browser_path = (
-            self.browser_path or browser_path_dispacher.get(OPERATING_SYSTEM)()
+        with self.timeline.measure("browser_discovery"):
+            self.browser_path = (
+                self.browser_path or browser_path_dispacher.get(OPERATING_SYSTEM)()
+            )
+        self.browser_command = self.browser_command or self.get_browser_command(
+            self.get_splash_url() if self.splash else None
+        )
+
+    def get_reload_config(self):
+        """What the reload server process needs to import the app and serve it."""
+        if not self.__default_server or self.server == "flask_socketio":
+            logger.warning(
+                "reload works only with the fastapi, flask and django servers"
+            )
+            return None
+
+        if isinstance(self.app, str):
+            app = {"app": self.app}
+        else:
+            main = sys.modules.get("__main__")
+            path = getattr(main, "__file__", None)
+            names = [name for name, value in vars(main).items() if value is self.app]
+            if path is None or not names:
+                logger.warning(
+                    'reload needs the app defined in the main script or app="module:attr"'
+                )
+                return None
+            app = {"path": os.path.abspath(path), "attr": names[0]}
+
+        return {
+            **app,
+            "factory": self.app_factory,
+            "server": self.server,
+            "threads": self.threads,
+            "shutdown_timeout": self.shutdown_timeout,
+        }
+
+    def get_reload_dirs(self):
+        if self.reload_dirs:
+            return self.reload_dirs
+        if "path" in self.reload_config:
+            return [os.path.dirname(self.reload_config["path"])]
+        return [os.getcwd()]
+
+    def on_reload(self, started: float, paths: List[str]):
+        # The socket stays bound when the new code crashes, stop waiting then
+        # so the watcher picks up the next edit
+        child = self.server_process.child
+        ready = wait_for_server(
+            self.port,
+            timeout=self.startup_timeout,
+            health_route=self.get_health_route(),
+            is_alive=lambda: child.poll() is None,
+        )
+        if ready is None:
+            if child.poll() is not None:
+                logger.warning(
+                    f"Reloaded server exited with code {child.returncode}, fix the errors above and save again"
+                )
+            else:
+                logger.warning("Reloaded server is not ready, check the errors above")
+            return
+
+        server_seconds = time.perf_counter() - started
+        self.reload_windows()
+        self.timeline.add("reload", started, time.perf_counter(), files=len(paths))
+        logger.info(
+            f"Reloaded in {time.perf_counter() - started:.3f}s (server ready in {server_seconds:.3f}s)"
+        )
+
+    def claim_instance(self):
+        """True if no other instance runs, else ask the running one for a window."""
+        directory = os.path.join(get_cache_dir(), "instances")
+        os.makedirs(directory, exist_ok=True)
+        app_id = get_app_id(self.profile_dir_prefix)
+        self.instance_lock = os.path.join(directory, f"{app_id}.lock")
+        instance_path = os.path.join(directory, f"{app_id}.json")
+
+        if acquire_lock(self.instance_lock):
+            self.instance = InstanceServer(instance_path, self.on_instance_request)
+            return True
+
+        reply = send_instance_request(instance_path, {"command": "activate"})
+        if reply is not None and reply.get("ok"):
+            logger.info(
+                f"Already running (pid {reply.get('pid')}), activated its window"
+            )
+            return False
+
+        logger.warning("Running instance is not answering, starting another one")
+        return True
+
+    def on_instance_request(self, request: dict):
+        if request.get("command") != "activate":
+            return {"ok": False, "error": f"Unknown command {request.get('command')}"}
+
+        # While starting the first window is on its way
+        if self.lifecycle.state == "running":
+            activate = Thread(target=self.activate_window)
+            activate.daemon = True
+            activate.start()
+        return {"ok": True, "pid": os.getpid()}
+
+    def activate_window(self):
+        devtools = self.get_devtools()
+        if devtools is not None:
+            pages = devtools.list_pages()
+            if pages:
+                devtools.activate_target(pages[0]["id"])
+                return
+        self.open_window()
+
+    def load_app(self):
+        try:
+            with self.timeline.measure("app_load"):
+                self.app = import_app(self.app, self.app_factory)
+        except BaseException as ex:
+            self.app_error = ex
+
+    def prepare_app(self):
+        """Wait for the app loaded in the background and hand it to the server."""
+        if self.app_loader is None:
+            return
+
+        self.app_loader.join()
+        self.app_loader = None
+        if self.app_error is not None:
+            # Nothing to serve, run() raises the error again after the shutdown
+            logger.error(f"Loading the app failed: {self.app_error!r}")
+            self.lifecycle.request_stop("app_error")
+            return
+
+        if self.__default_server:
+            self.server_kwargs["app"] = self.wrap_app(self.app, self.__interface)
+
+    def wrap_app(self, app: Any, interface: str = "wsgi"):
+        ignore_paths = [self.health_route] if self.health_route else []
+        on_first_request = self.mark_first_request
+
+        # From the app itself, middlewares hide its routes and static folder
+        static_dirs = None
+        if self.cache_static:
+            static_dirs = self.static_dirs or find_static_dirs(app)
+
+        # Innermost, only the requests handled by the app are measured
+        if self.metrics is not None:
+            if hasattr(app, "before_request_funcs"):
+                track_flask_routes(app)
+            app = wrap_app(
+                app,
+                lambda app: RouteMetricsMiddleware(app, self.metrics),
+                lambda app: AsgiRouteMetricsMiddleware(app, self.metrics),
+                interface,
+            )
+
+        if static_dirs:
+            with self.timeline.measure("static_index"):
+                index = StaticIndex(static_dirs)
+            app = wrap_app(
+                app,
+                lambda app: StaticFilesMiddleware(app, index),
+                lambda app: AsgiStaticFilesMiddleware(app, index),
+                interface,
+            )
+
+        return wrap_app(
+            app,
+            lambda app: FlaskUIMiddleware(
+                app, self.routes, on_first_request, ignore_paths
+            ),
+            lambda app: AsgiFlaskUIMiddleware(
+                app, self.routes, on_first_request, ignore_paths
+            ),
+            interface,
+        )
+
+    def get_profile_dir(self):
+        import uuid
+        import tempfile
+
+        if self.persistent_profile:
+            profile_dir = os.path.join(
+                get_cache_dir(), "profiles", get_app_id(self.profile_dir_prefix)
+            )
+            os.makedirs(profile_dir, exist_ok=True)
+            self.profile_lock = os.path.join(profile_dir, "flaskwebgui.lock")
+
+            if acquire_lock(self.profile_lock):
+                return profile_dir
+
+            logger.warning(
+                f"Profile {profile_dir} is used by another instance, using a temporary profile"
+            )
+            self.persistent_profile = False
+
+        profile_dir = os.path.join(
+            tempfile.gettempdir(), self.profile_dir_prefix + uuid.uuid4().hex
         )
-        self.browser_command = self.browser_command or self.get_browser_command()
 
-    def get_browser_command(self):
+        if self.profile_template is True:
+            self.profile_template = os.path.join(
+                get_cache_dir(), "templates", get_app_id(self.profile_dir_prefix)
+            )
+
+        if self.profile_template and os.path.isdir(self.profile_template):
+            self.profile_clone_seconds = clone_profile(
+                self.profile_template, profile_dir
+            )
+            logger.info(f"Cloned profile template in {self.profile_clone_seconds:.3f}s")
+
+        # The lock tells the stale profiles sweeper this profile is in use
+        os.makedirs(profile_dir, exist_ok=True)
+        self.profile_lock = os.path.join(profile_dir, "flaskwebgui.lock")
+        acquire_lock(self.profile_lock)
+
+        return profile_dir
+
+    def cleanup_profile(self):
+        if self.persistent_profile:
+            trim_profile_cache(self.profile_dir, self.profile_cache_max_mb)
+            release_lock(self.profile_lock)
+            return
+
+        # Windows can't move a folder with an open file inside
+        release_lock(self.profile_lock)
+        remove_dir_in_background(self.profile_dir)
+
+    def get_browser_command(
+        self, url: str = None, width: int = None, height: int = None
+    ):
         # https://peter.sh/experiments/chromium-command-line-switches/
+        url = url or self.url
+        width = width or self.width
+        height = height or self.height
 
         flags = [
             self.browser_path,
@@ -247,71 +3394,632 @@ class FlaskUI:
             "--no-first-run",
             "--disable-sync",
         ]
-    
-        if self.width and self.height and self.app_mode:
-            flags.extend([f"--window-size={self.width},{self.height}"])
+
+        if width and height and self.app_mode:
+            flags.extend([f"--window-size={width},{height}"])
         elif self.fullscreen:
             flags.extend(["--start-maximized"])
 
+        if self.remote_debugging:
+            flags.append("--remote-debugging-port=0")
+
+        flags.extend(browser_flag_presets[self.browser_preset])
+
         if self.extra_flags:
             flags = flags + self.extra_flags
 
         if self.app_mode:
-            flags.append(f"--app={self.url}")
+            flags.append(f"--app={url}")
         else:
-            flags.extend(["--guest", self.url])
+            flags.extend(["--guest", url])
 
         return flags
-    
-    
-    def start_browser(self, server_process: Union[Thread, Process]):
+
+    def get_splash_url(self):
+        # Our pre-bound socket holds the request until the server answers, no
+        # need for the splash page to poll 127.0.0.1 from its opaque origin
+        if self.health_route is not None:
+            ready_url = f"{self.url.rstrip('/')}/{self.health_route.lstrip('/')}"
+        elif self.socket is not None:
+            ready_url = None
+        elif self.__default_server:
+            ready_url = self.url + FLASKWEBGUI_ROUTE_PREFIX + "/ready"
+        else:
+            ready_url = self.url
+
+        if self.splash is True:
+            return get_splash_url(self.url, ready_url)
+
+        try:
+            with open(self.splash, encoding="utf-8") as f:
+                return get_splash_url(self.url, ready_url, f.read())
+        except OSError as ex:
+            logger.warning(f"Could not read splash page {self.splash}: {ex}")
+            return get_splash_url(self.url, ready_url)
+
+    def get_health_route(self):
+        # The kernel accepts connections on our listening socket right away
+        if self.health_route is None and self.socket is not None:
+            return FLASKWEBGUI_ROUTE_PREFIX + "/ready"
+        return self.health_route
+
+    def wait_for_server(self):
+        self.server_ready_seconds = wait_for_server(
+            self.port,
+            timeout=self.startup_timeout,
+            health_route=self.get_health_route(),
+        )
+
+        if self.server_ready_seconds is None:
+            self.timeline.mark("server_timeout")
+            logger.warning(
+                f"Server not ready on port {self.port} after {self.startup_timeout}s, opening browser anyway"
+            )
+        else:
+            self.timeline.mark("server_listening")
+            logger.info(f"Server ready in {self.server_ready_seconds:.3f}s")
+
+    def start_browser(self, server_process: Union[Thread, "Process"] = None):
+        import subprocess
+
+        if self.lifecycle.stop_requested.is_set():
+            return
+
+        # The splash page waits for the server itself, the browser starts meanwhile.
+        # While the app loads the browser request waits in the socket backlog.
+        launch_early = (
+            self.browser_path is not None
+            and self.app_error is None
+            and (
+                self.splash or (self.app_loader is not None and self.socket is not None)
+            )
+        )
+        if not launch_early:
+            self.wait_for_server()
+            self.lifecycle.set_state("running")
+
+        if self.lifecycle.stop_requested.is_set():
+            return
+
+        if self.browser_path is None:
+            logger.warning("No browser to open, server runs until stopped")
+            return
+
         logger.info(f"Command: {' '.join(self.browser_command)}")
         global FLASKWEBGUI_BROWSER_PROCESS
 
-        FLASKWEBGUI_BROWSER_PROCESS = subprocess.Popen(self.browser_command)
+        with self.timeline.measure("browser_spawn"):
+            FLASKWEBGUI_BROWSER_PROCESS = subprocess.Popen(self.browser_command)
         self.browser_pid = FLASKWEBGUI_BROWSER_PROCESS.pid
-        FLASKWEBGUI_BROWSER_PROCESS.wait()
 
-        if not self.auto_close:
+        if launch_early:
+            self.wait_for_server()
+            self.lifecycle.set_state("running")
+        self.windows.append(Window(url=self.url, process=FLASKWEBGUI_BROWSER_PROCESS))
+
+        if self.page_metrics:
+            # Long tasks are observed from the first app document on
+            instrument = Thread(target=self.instrument_pages)
+            instrument.daemon = True
+            instrument.start()
+
+        # All windows share the first browser process, it exits with the last window
+        wait_browser_exit(FLASKWEBGUI_BROWSER_PROCESS, self.profile_dir)
+        self.timeline.mark("browser_exit")
+        self.browser_pid = None
+        self.windows.clear()
+
+        if self.auto_close:
+            self.lifecycle.request_stop("browser_exit")
+
+    def get_processes(self):
+        """Server (this process and its children) and browser process trees."""
+        import psutil
+
+        browser = []
+        if self.browser_pid is not None:
+            try:
+                root = psutil.Process(self.browser_pid)
+                browser = [root] + root.children(recursive=True)
+            except psutil.Error:
+                # The launcher handed the window over to another browser process
+                for proc in find_profile_processes(self.profile_dir):
+                    try:
+                        browser += [proc] + proc.children(recursive=True)
+                    except psutil.Error:
+                        continue
+
+        browser_pids = {proc.pid for proc in browser}
+        current = psutil.Process()
+        server = [current] + [
+            proc
+            for proc in current.children(recursive=True)
+            if proc.pid not in browser_pids
+        ]
+        return {"server": server, "browser": browser}
+
+    def resources_route(self):
+        import json
+
+        return 200, "application/json", json.dumps(self.monitor.to_dict()).encode()
+
+    def metrics_route(self):
+        import json
+
+        return 200, "application/json", json.dumps(self.metrics.to_dict()).encode()
+
+    def get_route_metrics(self):
+        """Request counts, latency percentiles and histograms per route."""
+        if self.metrics is None:
+            logger.warning("Route metrics need route_metrics=True")
+            return {}
+        return self.metrics.to_dict()
+
+    def get_devtools(self):
+        if self.devtools is None and self.remote_debugging:
+            self.devtools = DevTools.from_profile(self.profile_dir)
+            if self.devtools is None:
+                logger.warning("Browser DevTools endpoint not available")
+        return self.devtools
+
+    def open_window(self, path: str = "/", width: int = None, height: int = None):
+        """Open another app window on the same server and browser profile.
+
+        With `remote_debugging=True` windows are tracked and can be closed
+        one by one, otherwise only the browser launch is known.
+        """
+        import subprocess
+
+        browser = FLASKWEBGUI_BROWSER_PROCESS
+        if browser is None or browser.poll() is not None:
+            logger.warning("Browser is not running, can't open a new window")
+            return None
+
+        devtools = self.get_devtools()
+        known_pages = set()
+        if devtools is not None:
+            known_pages = {page["id"] for page in devtools.list_pages()}
+            main_window = self.windows[0] if self.windows else None
+            if (
+                main_window is not None
+                and main_window.target_id is None
+                and known_pages
+            ):
+                main_window.target_id = next(iter(known_pages))
+
+        url = self.url + "/" + path.lstrip("/")
+        # The browser hands the new window to the running browser process and exits
+        process = subprocess.Popen(self.get_browser_command(url, width, height))
+        reaper = Thread(target=process.wait)
+        reaper.daemon = True
+        reaper.start()
+
+        window = Window(url=url, process=process)
+        if devtools is not None:
+            window.target_id = self.wait_new_page(devtools, known_pages)
+
+        self.windows.append(window)
+        logger.info(f"Opened window {url}")
+        return window
+
+    def wait_new_page(self, devtools: DevTools, known_pages: set, timeout: float = 10):
+        deadline = time.perf_counter() + timeout
+        delay = 0.01
+        while time.perf_counter() < deadline:
+            for page in devtools.list_pages():
+                if page["id"] not in known_pages:
+                    return page["id"]
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+        logger.warning("New window did not show up in the browser DevTools")
+        return None
+
+    def list_windows(self):
+        devtools = self.get_devtools()
+        if devtools is not None:
+            open_pages = {page["id"] for page in devtools.list_pages()}
+            self.windows = [
+                window
+                for window in self.windows
+                if window.target_id is None or window.target_id in open_pages
+            ]
+        return list(self.windows)
+
+    def close_window(self, window: Window):
+        if window.target_id is not None and self.get_devtools() is not None:
+            self.devtools.close_target(window.target_id)
+        elif window.process is FLASKWEBGUI_BROWSER_PROCESS:
+            # Without DevTools the only way is to close the browser with all windows
+            window.process.terminate()
+        else:
+            logger.warning("Closing a single window needs remote_debugging=True")
+            return False
+
+        if window in self.windows:
+            self.windows.remove(window)
+        return True
+
+    def serve(self):
+        try:
+            self.prepare_app()
+            if self.lifecycle.stop_requested.is_set():
+                return
+            self.server(**(self.server_kwargs or {}))
+        finally:
+            if not self.restart_server:
+                self.lifecycle.request_stop("server_exit")
+
+    def watch_server_process(self, server_process: Union[Thread, "Process"]):
+        """Stop the app when the server exits, or restart it with `restart_server`.
+
+        Restarts use the same listening socket and back off exponentially,
+        after `max_server_restarts` crashes in a row the app is stopped.
+        """
+        crashes = 0
+        while True:
+            started = time.perf_counter()
+            if self.restart_server and isinstance(server_process, ServerWorkers):
+                server_process.wait_any()
+            else:
+                server_process.join()
+            exited = time.perf_counter()
+
+            if self.lifecycle.stop_requested.is_set():
+                return
+            if not self.restart_server:
+                self.lifecycle.request_stop("server_exit")
+                return
+
+            # A server which ran for a while didn't crash in a loop
+            if exited - started > 30:
+                crashes = 0
+            if crashes >= self.max_server_restarts:
+                logger.error(f"Server crashed {crashes} times in a row, stopping")
+                self.lifecycle.request_stop("server_exit")
+                return
+
+            delay = min(0.1 * 2**crashes, 5)
+            crashes += 1
+            logger.warning(f"Server exited, restarting in {delay:.1f}s")
+            if self.lifecycle.stop_requested.wait(delay):
+                return
+
+            with self.restart_lock:
+                if self.lifecycle.stop_requested.is_set():
+                    return
+                server_process = self.restart_server_process(server_process)
+
+            ready = wait_for_server(
+                self.port,
+                timeout=self.startup_timeout,
+                health_route=self.get_health_route(),
+            )
+            if ready is None:
+                logger.warning(
+                    f"Restarted server not ready after {self.startup_timeout}s"
+                )
+                continue
+
+            downtime = time.perf_counter() - exited
+            self.server_restarts += 1
+            self.server_downtime += downtime
+            self.timeline.mark("server_restart", downtime=round(downtime, 6))
+            logger.info(f"Server restarted in {downtime:.3f}s")
+            self.reload_windows()
+
+    def restart_server_process(self, server_process: Union[Thread, "Process"]):
+        if isinstance(server_process, ServerWorkers):
+            server_process.restart_dead()
+            return server_process
+
+        # A server stopped in this process may have closed the socket
+        if self.socket is not None and self.socket.fileno() == -1:
+            self.socket = create_listening_socket(self.port)
+            self.server_kwargs["sock"] = self.socket
+
+        global FLASKWEBGUI_SERVER_PROCESS
+        server_process = self.create_server_process()
+        server_process.start()
+        FLASKWEBGUI_SERVER_PROCESS = self.server_process = server_process
+        return server_process
+
+    def get_page_monitor(self):
+        if self.page_monitor is None and self.page_metrics:
+            if self.get_devtools() is not None:
+                self.page_monitor = PageMetrics(self.devtools)
+        return self.page_monitor
+
+    def instrument_pages(self):
+        page_monitor = self.get_page_monitor()
+        if page_monitor is None:
             return
-        
-        if self.browser_path is None:
-            while self.__keyboard_interrupt is False:
-                time.sleep(1)
 
-        if isinstance(server_process, Process):
-            if self.on_shutdown is not None:
+        for page in self.devtools.list_pages():
+            try:
+                page_monitor.instrument(page["id"])
+            except (OSError, RuntimeError) as ex:
+                logger.warning(f"Could not observe {page.get('url')}: {ex}")
+
+    def get_page_metrics(self):
+        """Navigation timing, first contentful paint, JS heap and long tasks per window.
+
+        Needs `page_metrics=True`, returns a list with a dict per open page.
+        """
+        page_monitor = self.get_page_monitor()
+        if page_monitor is None:
+            logger.warning("Page metrics need page_metrics=True and a running browser")
+            return []
+
+        try:
+            pages = self.devtools.list_pages()
+        except OSError as ex:
+            logger.warning(f"Browser DevTools endpoint not available: {ex}")
+            return []
+        page_monitor.forget([page["id"] for page in pages])
+
+        metrics = []
+        for page in pages:
+            try:
+                metrics.append(
+                    {"target_id": page["id"], **page_monitor.collect(page["id"])}
+                )
+            except (OSError, RuntimeError) as ex:
+                logger.warning(f"Could not read metrics of {page.get('url')}: {ex}")
+        return metrics
+
+    def reload_windows(self):
+        devtools = self.get_devtools()
+        if devtools is None:
+            logger.info(
+                "Reload the window, automatic reload needs remote_debugging=True"
+            )
+            return
+
+        for page in devtools.list_pages():
+            try:
+                devtools.send(page["id"], "Page.reload")
+            except (OSError, RuntimeError) as ex:
+                logger.warning(f"Could not reload {page.get('url')}: {ex}")
+
+    def shutdown(self, server_process: Union[Thread, "Process"]):
+        self.lifecycle.set_state("stopping")
+
+        # New launches start their own instance instead of reaching this one
+        if self.instance is not None:
+            self.instance.close()
+            release_lock(self.instance_lock)
+
+        browser = FLASKWEBGUI_BROWSER_PROCESS
+        if browser is not None and browser.poll() is None:
+            import subprocess
+
+            browser.terminate()
+            try:
+                browser.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                browser.kill()
+
+        # Running requests may still need the process pool, stop the server first
+        if self.lifecycle.stop_reason != "server_exit" and self.__default_server:
+            if isinstance(server_process, Thread) and FLASKWEBGUI_SERVER_STOP is None:
+                # flask_socketio runs its own server, stop_server ends it below
+                logger.info("Server can't finish running requests, stopping it")
+            else:
+                with self.timeline.measure("server_stop"):
+                    start = time.perf_counter()
+                    drained = drain_server(server_process, self.shutdown_timeout)
+                if drained:
+                    logger.info(f"Server stopped in {time.perf_counter() - start:.3f}s")
+                else:
+                    logger.warning(f"Server did not stop in {self.shutdown_timeout}s")
+
+        global FLASKWEBGUI_PROCESS_POOL
+        if FLASKWEBGUI_PROCESS_POOL is not None:
+            FLASKWEBGUI_PROCESS_POOL.shutdown(wait=False, cancel_futures=True)
+            FLASKWEBGUI_PROCESS_POOL = None
+
+        if self.monitor is not None:
+            self.monitor.stop()
+        if self.page_monitor is not None:
+            self.page_monitor.close()
+
+        if self.on_shutdown is not None:
+            with self.timeline.measure("on_shutdown"):
                 self.on_shutdown()
-            self.browser_pid = None
-            shutil.rmtree(self.profile_dir, ignore_errors=True)
-            server_process.kill()
+        with self.timeline.measure("profile_cleanup"):
+            self.cleanup_profile()
+        self.report_timeline()
+
+        self.lifecycle.set_state("stopped")
+        if self.lifecycle.stop_reason != "server_exit":
+            stop_server(server_process, self.port, owned=self.__default_server)
+
+    def report_timeline(self):
+        if self.timeline_path is not None:
+            try:
+                self.timeline.save(self.timeline_path)
+            except OSError as ex:
+                logger.warning(f"Could not save timeline to {self.timeline_path}: {ex}")
+
+        if self.on_timeline is not None:
+            self.on_timeline(self.timeline)
+
+    def request_stop(self, reason: str):
+        if os.getpid() == self.pid:
+            self.lifecycle.request_stop(reason)
+        elif self.server_events is not None:
+            # Forked server, its stop event is a copy the parent never sees
+            self.server_events.send(("stop", reason))
         else:
-            if self.on_shutdown is not None:
-                self.on_shutdown()
-            self.browser_pid = None
-            shutil.rmtree(self.profile_dir, ignore_errors=True)
-            kill_port(self.port)
+            import signal
 
-    def run(self):
-        if self.on_startup is not None:
-            self.on_startup()
+            os.kill(os.getppid(), signal.SIGTERM)
+
+    def mark_first_request(self):
+        if os.getpid() == self.pid:
+            self.timeline.mark("first_request")
+        elif self.server_events is not None:
+            # Forked server, the timeline which gets reported is the parent's
+            self.server_events.send(("first_request", time.perf_counter()))
+
+    def listen_server_events(self):
+        """Pipe forked servers use to add events to our timeline or stop the app."""
+        import multiprocessing
+
+        if self.server_events is not None:
+            return
+
+        reader, self.server_events = multiprocessing.Pipe(duplex=False)
+
+        def receive():
+            while True:
+                try:
+                    name, value = reader.recv()
+                except (EOFError, OSError):
+                    return
+                if name == "stop":
+                    self.lifecycle.request_stop(value)
+                # Each worker reports its first request, keep the first one
+                elif self.timeline.get(name) is None:
+                    self.timeline.add(name, value)
+
+        receiver = Thread(target=receive)
+        receiver.daemon = True
+        receiver.start()
+
+    def create_server_process(self):
+        kwargs = self.server_kwargs or {}
+
+        server = self.server
+        if self.process_pool_size:
+            import functools
+
+            # Forked servers start their own pool, see run() for threads
+            server = functools.partial(
+                serve_with_process_pool,
+                self.server,
+                self.process_pool_size,
+                self.process_pool_preload,
+            )
+
+        if self.reload:
+            return ReloadServer(
+                self.reload_config,
+                self.socket,
+                self.get_reload_dirs(),
+                self.on_reload,
+                self.reload_includes,
+                self.shutdown_timeout,
+            )
+
+        if self.workers > 1:
+            if self.socket is not None and OPERATING_SYSTEM != "windows":
+                # Forked workers need the app loaded before they start
+                self.prepare_app()
+                if self.app_error is not None:
+                    # Nothing to fork, the thread returns and run() shuts down
+                    return Thread(target=self.serve)
+                self.listen_server_events()
+                return ServerWorkers(server, kwargs, self.workers)
+            logger.warning(
+                "Server workers need a default server and fork (Linux/Mac), using 1 worker"
+            )
 
         if OPERATING_SYSTEM == "darwin":
-            server_process = Process(
-                target=self.server, kwargs=self.server_kwargs or {}
+            import multiprocessing
+
+            self.prepare_app()
+            if self.app_error is not None:
+                return Thread(target=self.serve)
+            self.listen_server_events()
+
+            # fork keeps the app object usable in the server process
+            return multiprocessing.get_context("fork").Process(
+                target=server, kwargs=kwargs
             )
-        else:
-            server_process = Thread(target=self.server, kwargs=self.server_kwargs or {})
+
+        return Thread(target=self.serve)
+
+    def run(self):
+        if self.skip_run:
+            return None, None
+
+        global FLASKWEBGUI_UI
+        FLASKWEBGUI_UI = self
+        self.lifecycle.set_state("starting")
+
+        if self.cleanup_stale_profiles:
+            sweeper = Thread(
+                target=sweep_stale_profiles, args=(self.profile_dir_prefix,)
+            )
+            sweeper.daemon = True
+            sweeper.start()
+
+        if (
+            isinstance(self.profile_template, str)
+            and not self.persistent_profile
+            and self.browser_path is not None
+            and not os.path.isdir(self.profile_template)
+        ):
+            # Next launches clone it, this one runs with an empty profile
+            seeder = Thread(
+                target=seed_profile_template_from_browser,
+                args=(self.browser_path, self.profile_template),
+            )
+            seeder.daemon = True
+            seeder.start()
+
+        if self.on_startup is not None:
+            with self.timeline.measure("on_startup"):
+                self.on_startup()
+
+        server_process = self.create_server_process()
+
+        if self.process_pool_size and isinstance(server_process, Thread):
+            global FLASKWEBGUI_PROCESS_POOL
+            with self.timeline.measure("process_pool_start"):
+                FLASKWEBGUI_PROCESS_POOL = start_process_pool(
+                    self.process_pool_size, self.process_pool_preload
+                )
+
+        global FLASKWEBGUI_SERVER_PROCESS
+        FLASKWEBGUI_SERVER_PROCESS = self.server_process = server_process
+        self.restart_lock = threading.Lock()
 
         browser_thread = Thread(target=self.start_browser, args=(server_process,))
+        browser_thread.daemon = True
+
+        # Start the server before our signal handlers, forked workers inherit them
+        server_process.start()
+        self.timeline.mark("server_start")
 
+        if self.monitor is not None:
+            self.monitor.start()
+
+        previous_handlers = self.lifecycle.install_signal_handlers()
         try:
-            server_process.start()
+            if self.restart_server or not isinstance(server_process, Thread):
+                watcher = Thread(
+                    target=self.watch_server_process, args=(server_process,)
+                )
+                watcher.daemon = True
+                watcher.start()
             browser_thread.start()
-            server_process.join()
-            browser_thread.join()
-        except KeyboardInterrupt:
-            self.__keyboard_interrupt = True
-            logger.info("Stopped")
+            self.lifecycle.wait()
+        finally:
+            # The default handlers are needed to stop the server below
+            self.lifecycle.restore_signal_handlers(previous_handlers)
+
+        # The server may have been restarted meanwhile
+        with self.restart_lock:
+            server_process = self.server_process
+        self.shutdown(server_process)
+        server_process.join()
+
+        if self.socket is not None:
+            self.socket.close()
+
+        if self.app_error is not None:
+            raise self.app_error
 
         return server_process, browser_thread